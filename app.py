@@ -1,27 +1,154 @@
+import io
+import json
 import os
+import queue
 import sys
 import subprocess
 import threading
-import uuid
-from flask import Flask, request, render_template, jsonify, flash, redirect, url_for
+import time
+from flask import Flask, Response, request, render_template, jsonify, flash, redirect, url_for
+
+from domain_scanner import headless
+from domain_scanner.dns_cache import DnsCache
+from domain_scanner.http_session import build_session_from_args
+from domain_scanner.options import check_backend_arguments
+from domain_scanner.scan_engine import result_bucket
+from domain_scanner.scan_metrics import ScanMetrics
+from job_store import JobStore
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here'  # Replace with a secure key
 
-# Global dictionary to store job status
-jobs = {}
+# Scans run inside this process: at most MAX_CONCURRENT_SCANS at once, with up
+# to MAX_QUEUED_SCANS more waiting before new runs are turned away.
+MAX_CONCURRENT_SCANS = int(os.environ.get('MAX_CONCURRENT_SCANS', 2))
+MAX_QUEUED_SCANS = int(os.environ.get('MAX_QUEUED_SCANS', 10))
 
-def run_domain_checker(job_id, flags):
-    domain_checker_path = os.path.abspath('headless_checker.py')
-    command = [sys.executable, domain_checker_path] + flags
-    jobs[job_id]['status'] = 'running'
-    try:
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        jobs[job_id]['status'] = 'completed'
-        jobs[job_id]['output'] = result.stdout
-    except subprocess.CalledProcessError as e:
-        jobs[job_id]['status'] = 'error'
-        jobs[job_id]['output'] = e.stderr
+# Job history is kept in JOB_DB: the newest MAX_JOBS jobs, for up to
+# JOB_MAX_AGE seconds (a week by default).
+JOB_DB = os.environ.get('JOB_DB', 'jobs.db')
+MAX_JOBS = int(os.environ.get('MAX_JOBS', 100))
+JOB_MAX_AGE = int(os.environ.get('JOB_MAX_AGE', 7 * 24 * 3600))
+
+jobs = JobStore(JOB_DB, max_jobs=MAX_JOBS, max_age=JOB_MAX_AGE)
+
+# Phase timings, result buckets and retries of every scan run by this process, for /metrics.
+metrics = ScanMetrics()
+
+class JobProgress:
+    """
+    Turns a scan's results into job events: one "result" event per result that
+    needs reporting, and "progress" counters at most every `interval` seconds.
+    """
+    def __init__(self, job_id, interval=0.5):
+        self.job_id = job_id
+        self.interval = interval
+        self.checked = 0
+        self.counts = {}
+        self._last_published = 0
+
+    def record(self, result):
+        bucket = result_bucket(result)
+        self.checked += 1
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        if bucket != 'not_found':
+            jobs.add_event(self.job_id, 'result', {
+                'url': result.url,
+                'status': result.status,
+                'error': result.error,
+                'bucket': bucket
+            })
+        if time.monotonic() - self._last_published >= self.interval:
+            self.publish()
+
+    def publish(self):
+        self._last_published = time.monotonic()
+        jobs.set_progress(self.job_id, self.checked, self.counts)
+        jobs.add_event(self.job_id, 'progress', {'checked': self.checked, 'counts': dict(self.counts)})
+
+class JobOutput(io.TextIOBase):
+    """Text stream that appends a scan's report to its job's output as it is written."""
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        jobs.append_output(self.job_id, text)
+        return len(text)
+
+class ScanExecutor:
+    """
+    Runs headless_checker scans on a fixed pool of worker threads, taking jobs
+    from a bounded queue. The pooled HTTP sessions (one with and one without
+    certificate verification) and the DNS cache live as long as the executor,
+    so connections and lookups stay warm from one scan to the next.
+    """
+    def __init__(self, max_concurrent=2, max_queued=10):
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.dns_cache = DnsCache()
+        self._sessions = {}
+        self._lock = threading.Lock()
+        for _ in range(max_concurrent):
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def submit(self, job_id, flags):
+        """Queue a scan with the given command line flags. Returns False if the queue is full."""
+        try:
+            self.queue.put_nowait((job_id, flags))
+        except queue.Full:
+            return False
+        return True
+
+    def session_stats(self):
+        """Return the SessionStats of the warm sessions, for /metrics."""
+        with self._lock:
+            return [session.stats for session in self._sessions.values()]
+
+    def session_for(self, args):
+        """Return the warm session matching the scan's certificate verification setting."""
+        with self._lock:
+            session = self._sessions.get(args.ignore_ssl)
+            if session is None:
+                session = self._sessions[args.ignore_ssl] = build_session_from_args(args, dns_cache=self.dns_cache)
+            return session
+
+    def _work(self):
+        while True:
+            job_id, flags = self.queue.get()
+            try:
+                self._run(job_id, flags)
+            finally:
+                self.queue.task_done()
+
+    def _run(self, job_id, flags):
+        jobs.set_status(job_id, 'running')
+        progress = JobProgress(job_id)
+        status = 'error'
+        try:
+            parser = headless.build_parser()
+            args = parser.parse_args(flags)
+            check_backend_arguments(parser, args)
+            headless.run(
+                args,
+                out=JobOutput(job_id),
+                session=self.session_for(args),
+                dns_cache=self.dns_cache,
+                on_result=progress.record,
+                metrics=metrics
+            )
+            status = 'completed'
+        except SystemExit:
+            # argparse exits (having printed to stderr) on invalid flags.
+            jobs.append_output(job_id, "Invalid options: " + " ".join(flags))
+        except Exception as e:
+            jobs.append_output(job_id, f"\n{e}")
+        finally:
+            progress.publish()
+            jobs.finish(job_id, status)
+
+executor = ScanExecutor(max_concurrent=MAX_CONCURRENT_SCANS, max_queued=MAX_QUEUED_SCANS)
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
@@ -79,12 +206,12 @@ def run_script():
         if webhook_url:
             flags.extend(['--webhook-url', webhook_url])
     
-    job_id = str(uuid.uuid4())
-    jobs[job_id] = {'status': 'pending', 'output': ''}
+    job_id = jobs.create()
     
-    # Start the domain checker in a background thread
-    thread = threading.Thread(target=run_domain_checker, args=(job_id, flags))
-    thread.start()
+    # Queue the scan for the in-process executor
+    if not executor.submit(job_id, flags):
+        jobs.discard(job_id)
+        return jsonify({'error': 'Too many scans are already queued, please try again later.'}), 503
     
     return jsonify({'job_id': job_id})
 
@@ -95,5 +222,46 @@ def job_status(job_id):
         return jsonify({'status': 'not found'}), 404
     return jsonify(job)
 
+@app.route('/job_events/<job_id>')
+def job_events(job_id):
+    """
+    Stream a job's events as Server-Sent Events: "result" for each domain that
+    needs reporting, "progress" counters, and a final "done" with the report.
+    A reconnecting EventSource resumes after the Last-Event-ID it received.
+    """
+    if jobs.get(job_id) is None:
+        return jsonify({'status': 'not found'}), 404
+    try:
+        start = int(request.headers.get('Last-Event-ID', -1)) + 1
+    except ValueError:
+        start = 0
+
+    def stream():
+        position = start
+        while True:
+            events = jobs.events_since(job_id, position)
+            if events is None:
+                # The job was evicted while being streamed.
+                return
+            if not events:
+                # Keeps proxies from closing an idle connection.
+                yield ": keep-alive\n\n"
+                continue
+            for position, kind, data in events:
+                yield f"id: {position}\nevent: {kind}\ndata: {json.dumps(data)}\n\n"
+                if kind == 'done':
+                    return
+            position += 1
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Expose the scan metrics (phase timing histograms and counters) in the Prometheus text format."""
+    return Response(
+        metrics.render_prometheus(session_stats=executor.session_stats()),
+        mimetype='text/plain; version=0.0.4'
+    )
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,31 @@
+"""
+The domain checker's scanning library, shared by domain_checker.py,
+headless_checker.py and the web UI.
+
+    from domain_scanner import Scanner, ScanConfig
+
+    with Scanner(ScanConfig(concurrency=20)) as scanner:
+        for result in scanner.scan(["example.com"]):
+            ...
+
+Names are imported on first use, so the command line front-ends can parse
+their options (and print --help) without loading requests.
+"""
+import importlib
+
+_EXPORTS = {
+    "Scanner": "scanner",
+    "ScanConfig": "config",
+    "ScanResult": "scan_engine",
+    "ScanReport": "report",
+    "Transport": "transport",
+    "RequestsTransport": "transport",
+    "AsyncioTransport": "transport",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
@@ -0,0 +1,420 @@
+import asyncio
+import contextlib
+import ipaddress
+import queue
+import socket
+import ssl
+import threading
+import time
+from functools import partial
+from urllib.parse import urlsplit
+
+from .domain_loader import registrable_domain
+from .redirects import REDIRECT_STATUSES, record_redirects, recording_redirects, redirect_target
+from .scan_engine import ScanResult
+from .scan_metrics import record_phase, timing_phases
+
+MAX_REDIRECTS = 30
+
+# Response bodies longer than this are not read to keep their connection alive;
+# the connection is closed instead.
+MAX_DRAINED_BODY = 1024 * 1024
+
+class ProbeLimits:
+    """
+    Concurrency caps for the asyncio backend.
+
+    At most `max_in_flight` requests are open in total, and at most `per_host`
+    requests are open against any one resolved IP address or registrable domain.
+    A rate_limiter (see rate_limit.RateLimiter) additionally caps how many
+    requests are started per second. A key's semaphore is only kept while a
+    request holds or waits for it, so memory use doesn't grow with the number
+    of hosts scanned.
+    """
+    def __init__(self, max_in_flight=500, per_host=4, rate_limiter=None):
+        self.max_in_flight = max_in_flight
+        self.per_host = per_host
+        self.rate_limiter = rate_limiter
+        self._global = None
+        self._per_key = {}
+
+    @property
+    def global_semaphore(self):
+        # Created lazily so the semaphore belongs to the running event loop.
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.max_in_flight)
+        return self._global
+
+    @contextlib.asynccontextmanager
+    async def hold(self, key):
+        """Hold one of key's per_host slots for the duration of the block."""
+        # [semaphore, number of holders and waiters]; only used on the event loop's thread.
+        entry = self._per_key.get(key)
+        if entry is None:
+            entry = self._per_key[key] = [asyncio.Semaphore(self.per_host), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._per_key[key]
+
+def _ssl_context(ignore_ssl):
+    context = ssl.create_default_context()
+    if ignore_ssl:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+async def _resolve(loop, host, port, dns_cache, timeout):
+    if dns_cache is not None:
+        address = dns_cache.cached_address(host)
+        if address is None:
+            from .dns_cache import DnsError
+            try:
+                address = (await loop.run_in_executor(None, dns_cache.resolve, host))[0]
+            except DnsError as e:
+                raise ConnectionError(f"Failed to resolve '{host}' ({e})") from e
+        return address
+    try:
+        addresses = await asyncio.wait_for(
+            loop.getaddrinfo(host, port, type=socket.SOCK_STREAM), timeout
+        )
+    except OSError as e:
+        raise ConnectionError(f"Failed to resolve '{host}' ({e})") from e
+    return addresses[0][4][0]
+
+async def _open_connection(loop, host, address, port, context, timeout):
+    """
+    Connect to address, then (if a TLS context is given) do the handshake as a
+    separate step, so the two are timed as the "connect" and "tls" phases.
+    """
+    family = socket.AF_INET6 if ipaddress.ip_address(address).version == 6 else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    phase, started = "connect", time.monotonic()
+    try:
+        await asyncio.wait_for(loop.sock_connect(sock, (address, port)), timeout)
+        record_phase(phase, time.monotonic() - started)
+        phase, started = "tls", time.monotonic()
+        connection = await asyncio.wait_for(
+            asyncio.open_connection(sock=sock, ssl=context, server_hostname=host if context else None),
+            timeout
+        )
+        if context is not None:
+            record_phase(phase, time.monotonic() - started)
+        return connection
+    except asyncio.TimeoutError as e:
+        sock.close()
+        record_phase(phase, time.monotonic() - started)
+        raise ConnectionError(f"Connection to {host} timed out. (connect timeout={timeout})") from e
+    except OSError as e:
+        sock.close()
+        record_phase(phase, time.monotonic() - started)
+        raise ConnectionError(f"Failed to establish a new connection: {e}") from e
+
+async def _read_body(reader, status, headers):
+    """
+    Read and discard a response body, and return True if the connection can be
+    used for another request afterwards.
+    """
+    if 100 <= status < 200 or status in (204, 304):
+        return True
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                # Skip the trailers up to the blank line that ends the response.
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return True
+            await reader.readexactly(size + 2)
+    length = headers.get("content-length")
+    if length is None or not length.isdigit() or int(length) > MAX_DRAINED_BODY:
+        # The body ends when the server closes the connection.
+        return False
+    await reader.readexactly(int(length))
+    return True
+
+async def _exchange(reader, writer, request, read_timeout, keep_alive):
+    """
+    Send a request on an open connection and read the response. Return
+    (status, headers, reusable), where headers maps lower-case names to values
+    and reusable is True if the connection can be kept for another request.
+    """
+    writer.write(request)
+    await writer.drain()
+    started = time.monotonic()
+    status_line = await asyncio.wait_for(reader.readline(), read_timeout)
+    record_phase("ttfb", time.monotonic() - started)
+    fields = status_line.decode("latin-1").split()
+    if len(fields) < 2 or not fields[1].isdigit():
+        raise ConnectionError(f"Invalid HTTP status line: {status_line!r}")
+    status = int(fields[1])
+    headers = {}
+    while True:
+        line = await asyncio.wait_for(reader.readline(), read_timeout)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    reusable = keep_alive and fields[0] == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+    if reusable:
+        try:
+            reusable = await asyncio.wait_for(_read_body(reader, status, headers), read_timeout)
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            # The status is known; only the connection is lost.
+            reusable = False
+    return status, headers, reusable
+
+async def _fetch_status(url, context, limits, timeout, dns_cache=None, connections=None):
+    """
+    Send a single GET for url and return (status, location) from the response
+    headers. timeout is in seconds, or a (connect, read) pair as for requests.
+
+    With a connections dict, the connection is kept alive afterwards and stored
+    in it, keyed by scheme, host and port, for the next request to the same
+    server to reuse; otherwise it is closed after the response headers.
+    """
+    connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+    parts = urlsplit(url)
+    host = parts.hostname
+    secure = parts.scheme == "https"
+    try:
+        port = parts.port or (443 if secure else 80)
+    except ValueError as e:
+        raise ConnectionError(f"Invalid URL {url!r}: {e}") from e
+    if parts.scheme not in ("http", "https") or not host:
+        raise ConnectionError(f"Invalid URL {url!r}: no http(s) host to connect to")
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    key = (parts.scheme, host, port)
+    keep_alive = connections is not None
+    host_header = host if parts.port is None else f"{host}:{parts.port}"
+    request = (
+        f"GET {path} HTTP/1.1\r\n"
+        f"Host: {host_header}\r\n"
+        "User-Agent: domain_checker\r\n"
+        "Accept: */*\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    ).encode("ascii")
+
+    loop = asyncio.get_running_loop()
+    async with limits.hold("domain:" + registrable_domain(host)):
+        idle = connections.pop(key, None) if keep_alive else None
+        if idle is not None:
+            address = idle[0]
+        else:
+            started = time.monotonic()
+            try:
+                address = await _resolve(loop, host, port, dns_cache, connect_timeout)
+            finally:
+                record_phase("dns", time.monotonic() - started)
+        if limits.rate_limiter is not None:
+            await limits.rate_limiter.acquire_async(host, address)
+        async with limits.hold("ip:" + address), limits.global_semaphore:
+            while True:
+                if idle is not None:
+                    address, reader, writer = idle
+                else:
+                    reader, writer = await _open_connection(
+                        loop, host, address, port, context if secure else None, connect_timeout
+                    )
+                try:
+                    status, headers, reusable = await _exchange(reader, writer, request, read_timeout, keep_alive)
+                except ConnectionError:
+                    writer.close()
+                    if idle is None:
+                        raise
+                    # The server closed the idle connection; send the request on a new one.
+                    idle = None
+                    continue
+                except asyncio.TimeoutError as e:
+                    writer.close()
+                    raise ConnectionError(f"Read timed out. (read timeout={read_timeout})") from e
+                except BaseException:
+                    writer.close()
+                    raise
+                break
+            if reusable:
+                connections[key] = (address, reader, writer)
+            else:
+                writer.close()
+    if limits.rate_limiter is not None:
+        limits.rate_limiter.note_response(host, status, headers.get("retry-after"))
+    return status, headers.get("location")
+
+def _close_connections(connections):
+    for address, reader, writer in connections.values():
+        writer.close()
+    connections.clear()
+
+async def async_check_info_php(domain, ignore_ssl=False, follow_redirects=False,
+                               limits=None, timeout=5, context=None, dns_cache=None, path="/info.php",
+                               resolver=None, policy=None, connections=None):
+    """
+    asyncio implementation of check_info_php (checking `path` on the domain) with
+    the same return values. A RetryPolicy, if given, sets the timeouts, retries
+    and circuit breaker for every request instead of `timeout`. With a
+    connections dict, connections are kept alive in it for later checks to reuse
+    (see _fetch_status). With a RedirectResolver, the status (or error) of the
+    final target of any redirects is returned:
+
+      - (url, status, None) if the GET request is successful and returns a status code other than 404.
+      - (url, None, error_message) if the request fails.
+      - (None, None, None) if the response status code is 404 (i.e., desired response).
+    """
+    if limits is None:
+        limits = ProbeLimits()
+    if context is None:
+        context = _ssl_context(ignore_ssl)
+    if not domain.startswith("https://"):
+        domain = "https://" + domain
+    url = domain.rstrip("/") + path
+
+    async def fetch(target):
+        request = partial(_fetch_status, target, context, limits, dns_cache=dns_cache, connections=connections)
+        if policy is not None:
+            return await policy.arun(target, request)
+        return await request(timeout=timeout)
+
+    if resolver is not None:
+        status, error, redirects = await resolver.aresolve(url, fetch)
+        record_redirects(redirects)
+        if error is not None:
+            return url, None, error
+        return (url, status, None) if status != 404 else (None, None, None)
+    try:
+        target = url
+        status, location = await fetch(target)
+        redirects = 0
+        while follow_redirects and status in REDIRECT_STATUSES and location:
+            redirects += 1
+            if redirects > MAX_REDIRECTS:
+                raise ConnectionError(f"Exceeded {MAX_REDIRECTS} redirects.")
+            target = redirect_target(target, location)
+            status, location = await fetch(target)
+    except OSError as e:
+        return url, None, str(e)
+    if status != 404:
+        return url, status, None
+    return None, None, None
+
+def iter_async_scan(items, ignore_ssl=False, follow_redirects=False, limits=None, timeout=5,
+                    dns_cache=None, paths=("/info.php",), resolver=None, policy=None):
+    """
+    Run async_check_info_php for every path on every (index, domain) item on a
+    single event loop and yield a ScanResult for each (domain, path) as it
+    completes. The paths of one domain are checked one after the other, over
+    the same keep-alive connection where the server allows it.
+
+    The loop runs in a background thread so callers can consume the results as a
+    normal iterator. New probes are only started while fewer than
+    limits.max_in_flight are outstanding, and at most that many results wait to
+    be consumed, so the items are read lazily and a slow consumer holds the
+    scan back. The items are read in a worker thread, so an iterator that blocks
+    doesn't hold up the requests in flight. Closing the iterator cancels the
+    probes and stops the loop.
+    """
+    if limits is None:
+        limits = ProbeLimits()
+    results = queue.Queue()
+    finished = object()
+    stopping = threading.Event()
+    # The running loop, its main task and the semaphore bounding the results
+    # waiting to be consumed, once run() has started.
+    state = {}
+
+    # Keeping a connection alive means reading each response body, which only
+    # pays off when there is a further request to send on it.
+    keep_alive = len(paths) > 1 or follow_redirects or resolver is not None
+
+    async def probe(index, domain, context, slots):
+        connections = {} if keep_alive else None
+        try:
+            for path in paths:
+                started = time.monotonic()
+                with timing_phases() as timings, recording_redirects() as redirects:
+                    url, status, error = await async_check_info_php(
+                        domain, ignore_ssl=ignore_ssl, follow_redirects=follow_redirects,
+                        limits=limits, timeout=timeout, context=context, dns_cache=dns_cache, path=path,
+                        resolver=resolver, policy=policy, connections=connections
+                    )
+                elapsed = time.monotonic() - started
+                await state["room"].acquire()
+                results.put(ScanResult(
+                    index, domain, url, status, error, path, elapsed=elapsed, timings=timings,
+                    redirects=redirects or None
+                ))
+        finally:
+            if connections is not None:
+                _close_connections(connections)
+            slots.release()
+
+    async def run():
+        state.update(
+            loop=asyncio.get_running_loop(), task=asyncio.current_task(),
+            room=asyncio.Semaphore(limits.max_in_flight)
+        )
+        if stopping.is_set():
+            return
+        loop = asyncio.get_running_loop()
+        context = _ssl_context(ignore_ssl)
+        slots = asyncio.Semaphore(limits.max_in_flight)
+        tasks = set()
+        iterator = iter(items)
+        try:
+            while True:
+                # The items may block (--pre-resolve looks up each chunk of
+                # domains before yielding it), so they are read off the loop.
+                item = await loop.run_in_executor(None, next, iterator, finished)
+                if item is finished:
+                    break
+                index, domain = item
+                await slots.acquire()
+                task = asyncio.create_task(probe(index, domain, context, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            # Only left over if the scan was cancelled or failed.
+            pending = list(tasks)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def on_loop(callback):
+        try:
+            state["loop"].call_soon_threadsafe(callback)
+        except RuntimeError:
+            # The loop has already finished.
+            pass
+
+    def worker():
+        try:
+            asyncio.run(run())
+        except BaseException as e:
+            results.put(e)
+        finally:
+            results.put(finished)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = results.get()
+            if item is finished:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            on_loop(state["room"].release)
+            yield item
+    finally:
+        stopping.set()
+        if "task" in state:
+            on_loop(state["task"].cancel)
+        thread.join()
@@ -0,0 +1,78 @@
+import collections
+import json
+import os
+import time
+
+from .scan_engine import ScanResult
+
+class Checkpoint:
+    """
+    Append-only record of completed checks, one JSON line per domain and path.
+
+    Each line is handed to the operating system as soon as it is written, so a
+    killed process loses nothing; the file is synced to disk every `flush_every`
+    results or `flush_interval` seconds, whichever comes first, which bounds what
+    a reboot can lose. With resume=True the existing file is read first: the
+    domains in it are reported by `done` and their results by
+    `previous_results`; otherwise the file is started afresh. A domain only
+    counts as done once every one of `paths` has been checked on it.
+    """
+    def __init__(self, path, resume=False, flush_every=50, flush_interval=5.0, paths=("/info.php",)):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.done = set()
+        self.previous_results = []
+        if resume and os.path.exists(path):
+            self._load(set(paths))
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+        if self._file.tell() and not self._ends_with_newline():
+            # Start after a line cut short when the previous run was killed.
+            self._file.write("\n")
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def _load(self, paths):
+        checked = collections.defaultdict(set)
+        results = {}
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    result = ScanResult(*json.loads(line))
+                except (ValueError, TypeError):
+                    # A partially written last line from a run that was killed.
+                    continue
+                checked[result.domain].add(result.path)
+                # A domain checked again after an interruption keeps its latest result.
+                results[result.domain, result.path] = result
+        # Domains interrupted part way through their paths are checked again in full.
+        self.done = {domain for domain, done_paths in checked.items() if paths <= done_paths}
+        self.previous_results = [
+            result for result in results.values()
+            if result.domain in self.done and result.path in paths and result.url is not None
+        ]
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+    def write(self, result):
+        """Append a completed ScanResult, syncing if enough results or time have built up."""
+        self._file.write(json.dumps(list(result)) + "\n")
+        self._file.flush()
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Sync written results to disk."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        """Flush and close the checkpoint file."""
+        self.flush()
+        self._file.close()
@@ -0,0 +1,97 @@
+import argparse
+import dataclasses
+from dataclasses import dataclass
+
+@dataclass
+class ScanConfig:
+    """
+    Every option of a scan, with the same names and defaults as the command
+    line options of headless_checker.py (--concurrency is `concurrency`, and
+    so on). Library users build one directly; the command line front-ends
+    build one from their parsed arguments with from_args().
+
+    `paths` can list the paths to check instead of reading them from
+    `paths_file`; by default only /info.php is checked.
+    """
+    # Domain list
+    file: str = "domains.txt"
+    check_subdomains: bool = False
+    dedup: str = "set"
+    expected_domains: int = 10_000_000
+    # Requests
+    ignore_ssl: bool = False
+    follow_redirects: bool = False
+    paths_file: str = None
+    paths: tuple = None
+    # Engine
+    concurrency: int = 1
+    backend: str = "threads"
+    per_host_limit: int = 4
+    # HTTP session
+    pool_size: int = 10
+    pool_hosts: int = 100
+    no_keep_alive: bool = False
+    probe_mode: str = "get"
+    stats: bool = False
+    # DNS
+    pre_resolve: bool = False
+    dns_server: str = None
+    dns_concurrency: int = 50
+    # Result store
+    store: str = None
+    changed_only: bool = False
+    recheck_after: int = 0
+    # Checkpoint
+    checkpoint: str = None
+    resume: bool = False
+    # Timeouts and retries
+    connect_timeout: float = 5
+    read_timeout: float = 5
+    retries: int = 0
+    backoff: float = 0.5
+    adaptive_timeouts: bool = False
+    breaker_threshold: int = 0
+    # Rate limits
+    max_rate: float = 0
+    per_domain_rate: float = 0
+    per_ip_rate: float = 0
+    rate_burst: int = 1
+    # Redirects
+    resolve_redirects: bool = False
+    max_redirects: int = 10
+    # Content verification
+    verify_content: bool = False
+    sample_bytes: int = 4096
+    # Webhook
+    webhook_url: str = None
+    webhook_max_bytes: int = 20000
+    webhook_retries: int = 3
+    webhook_rate: float = 1.0
+    webhook_dedup_window: float = 0
+    webhook_state: str = "webhook_state.db"
+    # Output
+    format: str = "text"
+    # Distributed scans
+    coordinator: str = None
+    worker: str = None
+    authkey: str = None
+    shards: int = 64
+    shard_size: int = 100
+    task_timeout: float = 600
+
+    @classmethod
+    def from_args(cls, args):
+        """Build a ScanConfig from parsed command line arguments, ignoring options it doesn't know."""
+        values = vars(args)
+        return cls(**{field.name: values[field.name] for field in dataclasses.fields(cls) if field.name in values})
+
+    def to_args(self):
+        """Return the options as an argparse.Namespace, as the build_*_from_args helpers take."""
+        return argparse.Namespace(**dataclasses.asdict(self))
+
+    def replace(self, **changes):
+        """Return a copy of this config with some options changed."""
+        return dataclasses.replace(self, **changes)
+
+# The defaults of the command line options.
+DEFAULTS = ScanConfig()
@@ -0,0 +1,197 @@
+import collections
+import concurrent.futures
+import hashlib
+import re
+import secrets
+import threading
+from collections import namedtuple
+from functools import partial
+from urllib.parse import urlsplit
+
+import requests
+
+from .http_session import read_sample
+
+# Byte strings that only appear in the real content of a path. A HTTP 200 whose
+# first few KB contain one of them is confirmed as exposed.
+PHPINFO_SIGNATURES = (b"<title>phpinfo()</title>", b"PHP Version", b"PHP License", b"phpinfo()")
+SIGNATURES = {
+    "/info.php": PHPINFO_SIGNATURES,
+    "/phpinfo.php": PHPINFO_SIGNATURES,
+    "/.env": (b"APP_KEY=", b"DB_PASSWORD=", b"DB_HOST=", b"SECRET_KEY="),
+    "/.git/config": (b"[core]", b"repositoryformatversion"),
+    "/server-status": (b"Apache Server Status", b"Server uptime"),
+}
+
+# Verdicts given to HTTP 200 results.
+CONFIRMED = "confirmed"      # The response contains a signature for the path.
+SOFT_404 = "soft-404"        # The response matches the host's page for a missing path.
+UNCONFIRMED = "unconfirmed"  # Neither; still reported as urgent.
+
+def simhash(body, bits=64):
+    """
+    Return a similarity hash of body: bodies that differ only in a few words
+    (a timestamp, the requested path echoed back) have hashes a few bits apart.
+    """
+    tokens = re.findall(rb"\w+", body.lower())
+    if len(tokens) >= 3:
+        features = [b" ".join(tokens[i:i + 3]) for i in range(len(tokens) - 2)]
+    else:
+        features = tokens or [body]
+    weights = [0] * bits
+    for feature in features:
+        value = int.from_bytes(hashlib.blake2b(feature, digest_size=bits // 8).digest(), "little")
+        for bit in range(bits):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(bits) if weights[bit] > 0)
+
+def hamming_distance(first, second):
+    """Return the number of bits that differ between two hashes."""
+    return bin(first ^ second).count("1")
+
+def page_hash(body, path):
+    """Return the simhash of body with any echo of the requested path removed."""
+    return simhash(body.replace(path.encode("utf-8", "replace"), b""))
+
+# A response's status and headers, and the first bytes of its body.
+Sample = namedtuple("Sample", ["status_code", "headers", "body"])
+
+def fetch_sample(http, url, sample_bytes, **kwargs):
+    """
+    Send a streamed GET for url and return a Sample of the response, with the
+    first sample_bytes of the body. The rest of the body is never downloaded.
+    Errors reading the body are raised as a requests.RequestException, like
+    those of the request.
+    """
+    try:
+        response = http.get(url, stream=True, **kwargs)
+    except ValueError as e:
+        raise requests.exceptions.InvalidURL(f"Invalid URL in response to {url}: {e}") from e
+    try:
+        return Sample(response.status_code, response.headers, read_sample(response, sample_bytes))
+    finally:
+        response.close()
+
+class ContentClassifier:
+    """
+    Second look at HTTP 200 results, to tell real exposures from hosts that
+    answer every path with the same page (SPA catch-alls, parked domains).
+
+    The first sample_bytes of the response are checked for the signatures of
+    the path. If none is found, they are compared with the host's baseline: the
+    response to a random path that can't exist, fetched once per host and
+    memoised for the rest of the run. A response within max_distance bits of
+    the baseline's simhash (ignoring the requested path, which error pages often
+    echo back) is a soft 404.
+
+    A probe that already read the first bytes of a response hands them over
+    with keep_sample(), so only the baseline costs an extra request. Responses
+    that weren't sampled that way are requested again.
+    """
+    def __init__(self, session=None, sample_bytes=4096, max_distance=3, ignore_ssl=False,
+                 follow_redirects=False, policy=None, limiter=None, max_samples=10000):
+        self.session = session
+        self.sample_bytes = sample_bytes
+        self.max_distance = max_distance
+        self.ignore_ssl = ignore_ssl
+        self.follow_redirects = follow_redirects
+        self.policy = policy
+        self.limiter = limiter
+        self.max_samples = max_samples
+        self._baselines = {}
+        self._samples = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def keep_sample(self, url, body):
+        """
+        Remember the first bytes of url's HTTP 200 body, read by the probe, for
+        classify(). Only the max_samples most recent are kept, in case a result
+        is never classified.
+        """
+        with self._lock:
+            self._samples[url] = body[:self.sample_bytes]
+            if len(self._samples) > self.max_samples:
+                self._samples.popitem(last=False)
+
+    def _sample(self, url):
+        """Return (status, first sample_bytes of the body) for url."""
+        request = partial(
+            fetch_sample,
+            self.session if self.session is not None else requests,
+            url,
+            self.sample_bytes,
+            verify=(not self.ignore_ssl),
+            allow_redirects=self.follow_redirects
+        )
+        if self.policy is not None:
+            sample = self.policy.run(url, request, limiter=self.limiter)
+        else:
+            if self.limiter is not None:
+                request = self.limiter.wrap(url, request)
+            sample = request(timeout=5)
+        return sample.status_code, sample.body
+
+    def baseline(self, url):
+        """
+        Return the simhash of the host's response to a random path, or None if
+        the host doesn't answer such paths with HTTP 200 (or couldn't be asked).
+        Concurrent callers for the same host share a single request.
+        """
+        parts = urlsplit(url)
+        key = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            future = self._baselines.get(key)
+            owner = future is None
+            if owner:
+                future = self._baselines[key] = concurrent.futures.Future()
+        if owner:
+            path = f"/{secrets.token_hex(12)}.php"
+            try:
+                status, body = self._sample(key + path)
+                future.set_result(page_hash(body, path) if status == 200 else None)
+            except requests.RequestException:
+                future.set_result(None)
+            except BaseException as e:
+                # Waiting callers for the host must never be left blocked.
+                future.set_exception(e)
+                raise
+        return future.result()
+
+    def classify(self, url, path):
+        """Return the verdict for a URL that returned HTTP 200, or None if it couldn't be sampled."""
+        with self._lock:
+            body = self._samples.pop(url, None)
+        if body is None:
+            try:
+                status, body = self._sample(url)
+            except requests.RequestException:
+                return None
+            if status != 200:
+                return None
+        if any(signature in body for signature in SIGNATURES.get(path, ())):
+            return CONFIRMED
+        baseline = self.baseline(url)
+        if baseline is not None and hamming_distance(page_hash(body, path), baseline) <= self.max_distance:
+            return SOFT_404
+        return UNCONFIRMED
+
+    def classify_result(self, result):
+        """
+        Return a copy of a ScanResult with its verdict filled in. With resolved
+        redirects, the final target is the URL that is sampled.
+        """
+        url = result.redirects[-1] if result.redirects else result.url
+        return result._replace(verdict=self.classify(url, result.path))
+
+def build_classifier_from_args(args, session=None, policy=None, limiter=None):
+    """Build the ContentClassifier described by the command line options, or None if disabled."""
+    if not args.verify_content:
+        return None
+    return ContentClassifier(
+        session=session,
+        sample_bytes=args.sample_bytes,
+        ignore_ssl=args.ignore_ssl,
+        follow_redirects=args.follow_redirects,
+        policy=policy,
+        limiter=limiter
+    )
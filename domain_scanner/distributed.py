@@ -0,0 +1,164 @@
+import bisect
+import hashlib
+import queue
+import threading
+import time
+from multiprocessing.managers import BaseManager
+
+from .dns_cache import host_of, parse_server
+from .options import DEFAULT_PORT
+from .scan_engine import ScanResult
+
+class HashRing:
+    """
+    Consistent hash ring mapping host names to shard numbers. Every shard owns
+    `replicas` points on the ring, so changing the number of shards only moves
+    about 1/shards of the hosts to a different shard.
+    """
+    def __init__(self, shards, replicas=64):
+        self.shards = shards
+        points = sorted(
+            (self._hash(f"shard-{shard}-{replica}"), shard) for shard in range(shards) for replica in range(replicas)
+        )
+        self._keys = [key for key, shard in points]
+        self._shards = [shard for key, shard in points]
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def shard_for(self, host):
+        """Return the shard that owns host."""
+        position = bisect.bisect(self._keys, self._hash(host)) % len(self._keys)
+        return self._shards[position]
+
+def iter_shards(items, ring, shard_size=100):
+    """
+    Group (index, domain) items into (shard, [items]) tasks of up to shard_size
+    items, so every domain of a host lands in the same shard (and so on the same
+    worker, which can reuse its connections). At most one partly filled task per
+    shard is held in memory.
+    """
+    pending = {}
+    for index, domain in items:
+        shard = ring.shard_for(host_of(domain))
+        batch = pending.setdefault(shard, [])
+        batch.append((index, domain))
+        if len(batch) >= shard_size:
+            yield shard, pending.pop(shard)
+    for shard, batch in pending.items():
+        yield shard, batch
+
+class ScanManager(BaseManager):
+    """Serves the task and result queues shared by the coordinator and its workers."""
+
+def _authkey(authkey):
+    return authkey.encode("utf-8") if isinstance(authkey, str) else authkey
+
+def coordinate(items, address, authkey, shards=64, shard_size=100, task_timeout=600, max_queued=100):
+    """
+    Serve (index, domain) items to workers on address and yield the ScanResults
+    they send back, as each task completes.
+
+    Items are sharded by consistent hash of the host name into tasks of up to
+    shard_size domains. A task that isn't finished within task_timeout seconds
+    (its worker died or lost its connection) is handed out again; if both
+    copies finish, only the first result is used.
+    """
+    tasks = queue.Queue(maxsize=max_queued)
+    results = queue.Queue()
+    finished = threading.Event()
+    ScanManager.register("tasks", callable=lambda: tasks)
+    ScanManager.register("results", callable=lambda: results)
+    ScanManager.register("finished", callable=lambda: finished)
+    manager = ScanManager(address=address, authkey=_authkey(authkey))
+    server = manager.get_server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    lock = threading.Lock()
+    outstanding = {}   # task_id -> (time handed out, task)
+    produced = threading.Event()
+    total = [0]
+
+    def produce():
+        for task_id, (shard, batch) in enumerate(iter_shards(items, HashRing(shards), shard_size)):
+            task = (task_id, shard, batch)
+            with lock:
+                outstanding[task_id] = (time.monotonic(), task)
+                total[0] += 1
+            tasks.put(task)
+        produced.set()
+
+    threading.Thread(target=produce, daemon=True).start()
+    completed = set()
+    try:
+        while not (produced.is_set() and len(completed) == total[0]):
+            try:
+                task_id, rows = results.get(timeout=1)
+            except queue.Empty:
+                now = time.monotonic()
+                with lock:
+                    expired = [
+                        task for task_id, (started, task) in outstanding.items() if now - started > task_timeout
+                    ]
+                    for task in expired:
+                        outstanding[task[0]] = (now, task)
+                for task in expired:
+                    tasks.put(task)
+                continue
+            if task_id in completed:
+                continue
+            completed.add(task_id)
+            with lock:
+                outstanding.pop(task_id, None)
+            for row in rows:
+                yield ScanResult(*row)
+    finally:
+        finished.set()
+        # Give idle workers a moment to notice the scan is over before the
+        # server goes away with this process.
+        time.sleep(1.5)
+
+def connect(address, authkey, wait=30):
+    """Connect to a coordinator, retrying for up to wait seconds while it starts."""
+    ScanManager.register("tasks")
+    ScanManager.register("results")
+    ScanManager.register("finished")
+    manager = ScanManager(address=address, authkey=_authkey(authkey))
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            manager.connect()
+            return manager
+        except ConnectionRefusedError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.5)
+
+def work(address, authkey, check_items, wait=30):
+    """
+    Take tasks from the coordinator at address and send back their results until
+    it reports that the scan is finished (or goes away). check_items(items) must
+    return the ScanResults for a list of (index, domain) items. Returns the
+    number of tasks completed.
+    """
+    manager = connect(address, authkey, wait=wait)
+    tasks, results, finished = manager.tasks(), manager.results(), manager.finished()
+    completed = 0
+    try:
+        while not finished.is_set():
+            try:
+                task_id, shard, batch = tasks.get(timeout=1)
+            except queue.Empty:
+                continue
+            rows = [list(result) for result in check_items(batch)]
+            results.put((task_id, rows))
+            completed += 1
+    except (EOFError, ConnectionError):
+        # The coordinator has exited.
+        pass
+    return completed
+
+def address_from(value):
+    """Parse a --coordinator / --worker HOST[:PORT] value."""
+    return parse_server(value, default_port=DEFAULT_PORT)
@@ -0,0 +1,241 @@
+import concurrent.futures
+import ipaddress
+import itertools
+import random
+import socket
+import struct
+import threading
+import time
+from urllib.parse import urlsplit
+
+class DnsError(Exception):
+    """A lookup failed in a way that may be transient (timeout, SERVFAIL, ...)."""
+
+class NameNotFound(DnsError):
+    """The name definitely has no addresses (NXDOMAIN or no A/AAAA records)."""
+
+def host_of(domain):
+    """Return the host name that check_info_php would connect to for a domain entry."""
+    if not domain.startswith("https://"):
+        domain = "https://" + domain
+    return urlsplit(domain).hostname or ""
+
+class SystemResolver:
+    """
+    Resolve names with the operating system resolver (socket.getaddrinfo).
+
+    getaddrinfo doesn't expose record TTLs, so every answer is given default_ttl.
+    """
+    def __init__(self, default_ttl=300):
+        self.default_ttl = default_ttl
+
+    def resolve(self, host):
+        """Return (addresses, ttl) for host, or raise NameNotFound / DnsError."""
+        try:
+            infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            if e.errno in (socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME)):
+                raise NameNotFound(str(e)) from e
+            raise DnsError(str(e)) from e
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        return addresses, self.default_ttl
+
+class UdpResolver:
+    """
+    Minimal DNS-over-UDP client that sends A (then AAAA) queries to one server.
+
+    Unlike SystemResolver it sees the record TTLs, and pointing it at a local stub
+    server (see tools/stub_dns.py) makes scans reproducible without real DNS.
+    """
+    def __init__(self, server, port=53, timeout=2.0, attempts=2):
+        self.server = server
+        self.port = port
+        self.timeout = timeout
+        self.attempts = attempts
+
+    def resolve(self, host):
+        """Return (addresses, ttl) for host, or raise NameNotFound / DnsError."""
+        addresses, ttl = self._query(host, 1)
+        if not addresses:
+            addresses, ttl = self._query(host, 28)
+        if not addresses:
+            raise NameNotFound("no address records")
+        return addresses, ttl
+
+    def _query(self, host, qtype):
+        query_id = random.randrange(1 << 16)
+        packet = struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 0)
+        packet += encode_name(host) + struct.pack("!HH", qtype, 1)
+        for attempt in range(self.attempts):
+            with socket.socket(socket.AF_INET6 if ":" in self.server else socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.settimeout(self.timeout)
+                try:
+                    sock.sendto(packet, (self.server, self.port))
+                    while True:
+                        reply, _ = sock.recvfrom(4096)
+                        if len(reply) >= 12 and struct.unpack("!H", reply[:2])[0] == query_id:
+                            break
+                except socket.timeout:
+                    continue
+                except OSError as e:
+                    raise DnsError(f"DNS query for '{host}' failed: {e}") from e
+            return parse_response(reply, host)
+        raise DnsError(f"DNS query for '{host}' timed out")
+
+def encode_name(host):
+    """Encode a host name as a sequence of DNS labels."""
+    encoded = b""
+    for label in host.rstrip(".").split("."):
+        label = label.encode("idna")
+        encoded += bytes([len(label)]) + label
+    return encoded + b"\0"
+
+def _skip_name(message, offset):
+    while True:
+        length = message[offset]
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        offset += 1
+        if length == 0:
+            return offset
+        offset += length
+
+def parse_response(message, host):
+    """Return (addresses, ttl) from a DNS response, raising on NXDOMAIN or server errors."""
+    _, flags, qdcount, ancount, _, _ = struct.unpack("!HHHHHH", message[:12])
+    rcode = flags & 0xF
+    if rcode == 3:
+        raise NameNotFound("NXDOMAIN")
+    if rcode != 0:
+        raise DnsError(f"DNS server returned rcode {rcode} for '{host}'")
+    offset = 12
+    for _ in range(qdcount):
+        offset = _skip_name(message, offset) + 4
+    addresses = []
+    ttls = []
+    for _ in range(ancount):
+        offset = _skip_name(message, offset)
+        rtype, _, ttl, length = struct.unpack("!HHIH", message[offset:offset + 10])
+        offset += 10
+        data = message[offset:offset + length]
+        offset += length
+        if rtype == 1 and length == 4:
+            addresses.append(socket.inet_ntop(socket.AF_INET, data))
+            ttls.append(ttl)
+        elif rtype == 28 and length == 16:
+            addresses.append(socket.inet_ntop(socket.AF_INET6, data))
+            ttls.append(ttl)
+    return addresses, min(ttls) if ttls else 0
+
+class DnsCache:
+    """
+    Thread-safe, TTL-aware cache in front of a resolver.
+
+    Answers are kept for their TTL clamped to [min_ttl, max_ttl]; names that don't
+    exist are remembered for negative_ttl. Transient failures are not cached.
+    """
+    def __init__(self, resolver=None, min_ttl=30, max_ttl=3600, negative_ttl=300):
+        self.resolver = resolver if resolver is not None else SystemResolver()
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, host):
+        """Return the list of addresses for host, raising NameNotFound or DnsError."""
+        host = host.lower().rstrip(".")
+        if _is_ip_address(host):
+            return [host]
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                if isinstance(entry[1], NameNotFound):
+                    raise entry[1]
+                return entry[1]
+            self.misses += 1
+        try:
+            addresses, ttl = self.resolver.resolve(host)
+        except NameNotFound as e:
+            with self._lock:
+                self._entries[host] = (now + self.negative_ttl, e)
+            raise
+        ttl = min(max(ttl, self.min_ttl), self.max_ttl)
+        with self._lock:
+            self._entries[host] = (time.monotonic() + ttl, addresses)
+        return addresses
+
+    def cached_address(self, host):
+        """Return the first cached address for host without doing a lookup, or None."""
+        host = host.lower().rstrip(".")
+        with self._lock:
+            entry = self._entries.get(host)
+        if entry is None or entry[0] <= time.monotonic() or isinstance(entry[1], NameNotFound):
+            return None
+        return entry[1][0]
+
+def _is_ip_address(host):
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+    except ValueError:
+        return False
+    return True
+
+def pre_resolve(items, cache, concurrency=50, chunk_size=1000):
+    """
+    Resolve the hosts of (index, domain) items concurrently, a chunk at a time.
+
+    Yields (index, domain, addresses, error) tuples. Within each chunk the items
+    are grouped by their first resolved address so probes for hosts on the same
+    server run back to back; error is set (and addresses empty) for names that
+    don't exist, and None when the lookup succeeded or failed only transiently.
+    """
+    items = iter(items)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            chunk = list(itertools.islice(items, chunk_size))
+            if not chunk:
+                return
+
+            def lookup(item):
+                host = host_of(item[1])
+                try:
+                    return cache.resolve(host), None
+                except NameNotFound as e:
+                    return [], f"Failed to resolve '{host}' ({e})"
+                except DnsError:
+                    # Let the probe itself retry the lookup and report any error.
+                    return [], None
+
+            resolved = list(executor.map(lookup, chunk))
+            order = sorted(
+                range(len(chunk)),
+                key=lambda i: (resolved[i][0][0] if resolved[i][0] else "", i)
+            )
+            for i in order:
+                index, domain = chunk[i]
+                addresses, error = resolved[i]
+                yield index, domain, addresses, error
+
+def build_dns_cache_from_args(args):
+    """Return the DnsCache described by the command line options, or None if disabled."""
+    if not args.pre_resolve and not args.dns_server:
+        return None
+    resolver = None
+    if args.dns_server:
+        resolver = UdpResolver(*parse_server(args.dns_server))
+    return DnsCache(resolver)
+
+def parse_server(value, default_port=53):
+    """Split HOST, HOST:PORT, IPv6 or [IPv6]:PORT into (host, port)."""
+    if value.startswith("["):
+        host, _, port = value[1:].partition("]")
+        return host, int(port.lstrip(":") or default_port)
+    if value.count(":") == 1:
+        host, port = value.split(":")
+        return host, int(port)
+    return value, default_port
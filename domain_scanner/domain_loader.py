@@ -0,0 +1,141 @@
+import hashlib
+import math
+
+# Public suffixes made of more than one label that are common in our estate. A
+# full public suffix list would be more accurate, but this keeps the per-domain
+# limit from treating every *.co.uk customer as the same registrable domain.
+MULTI_LABEL_SUFFIXES = {
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "ltd.uk", "plc.uk", "me.uk", "net.uk",
+    "com.au", "net.au", "org.au", "co.nz", "org.nz", "co.za", "com.br", "co.jp",
+    "co.in", "com.cn", "com.mx", "com.tr", "com.sg", "com.hk",
+}
+
+def registrable_domain(host):
+    """Return the registrable part of a host name, e.g. www.example.co.uk -> example.co.uk."""
+    labels = host.lower().rstrip(".").split(".")
+    if len(labels) <= 2:
+        return ".".join(labels)
+    if ".".join(labels[-2:]) in MULTI_LABEL_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+def normalise_domain(entry):
+    """
+    Normalise a domains file entry so equivalent spellings compare equal.
+
+    The scheme and trailing slashes are removed and the host name is lower-cased
+    and IDNA encoded, so "https://Example.com/" and "example.com" both become
+    "example.com". Any port or path is kept. Returns None for blank entries.
+    """
+    entry = entry.strip()
+    lowered = entry.lower()
+    for scheme in ("https://", "http://"):
+        if lowered.startswith(scheme):
+            entry = entry[len(scheme):]
+            break
+    entry = entry.rstrip("/")
+    if not entry:
+        return None
+    host, slash, path = entry.partition("/")
+    host = host.lower().rstrip(".")
+    name, colon, port = host.rpartition(":") if host.count(":") == 1 else (host, "", "")
+    try:
+        name = name.encode("idna").decode("ascii")
+    except UnicodeError:
+        # Not a valid IDNA name; leave it for the request to fail and report.
+        pass
+    return name + colon + port + slash + path
+
+def iter_domains(filename):
+    """Yield the normalised, non-blank entries of a domains file one at a time."""
+    with open(filename, 'r', encoding="utf-8") as file:
+        for line in file:
+            domain = normalise_domain(line)
+            if domain:
+                yield domain
+
+def with_www_variants(domains):
+    """Yield each domain followed by its www. variant (if it doesn't already start with www.)."""
+    for domain in domains:
+        yield domain
+        if not domain.lower().startswith("www."):
+            yield "www." + domain
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter for de-duplicating very large domain lists.
+
+    Memory use depends only on `capacity` and `error_rate`, not on the input size,
+    at the cost of wrongly treating roughly error_rate of new entries as seen.
+    """
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        """Add item and return True if it was (probably) already present."""
+        present = True
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                present = False
+                self.bits[byte] |= 1 << bit
+        return present
+
+class DomainDeduplicator:
+    """
+    Drop repeated domains from a stream.
+
+    mode is "set" (exact, memory grows with the number of unique domains),
+    "bloom" (fixed memory sized for `capacity` domains, with a small chance of
+    skipping a domain that wasn't actually seen) or "none".
+    """
+    def __init__(self, mode="set", capacity=10_000_000):
+        self.mode = mode
+        self.duplicates = 0
+        if mode == "bloom":
+            self._seen = BloomFilter(capacity)
+        elif mode == "set":
+            self._seen = set()
+        else:
+            self._seen = None
+
+    def _is_duplicate(self, domain):
+        if self._seen is None:
+            return False
+        if self.mode == "bloom":
+            return self._seen.add(domain)
+        if domain in self._seen:
+            return True
+        self._seen.add(domain)
+        return False
+
+    def filter(self, domains):
+        """Yield the domains that haven't been seen before, counting the rest in self.duplicates."""
+        for domain in domains:
+            if self._is_duplicate(domain):
+                self.duplicates += 1
+            else:
+                yield domain
+
+def count_entries(domains):
+    """Count the entries of a (lazy) domain stream without keeping them in memory."""
+    return sum(1 for _ in domains)
+
+def load_domains(filename):
+    """Load and return a list of normalised domains from the given file, one per line."""
+    return list(iter_domains(filename))
+
+def extend_domains(domains_list):
+    """
+    For each domain in the list, return a new list that includes both the
+    original domain and its www. variant (if not already present).
+    """
+    return list(with_www_variants(domains_list))
@@ -0,0 +1,168 @@
+import itertools
+import os
+import sys
+from functools import partial
+
+from .options import build_headless_parser, check_backend_arguments
+
+# The headless checker's command line options.
+build_parser = build_headless_parser
+
+def print_report(report, out=None):
+    """Print the grouped text report of a finished ScanReport to out."""
+    urgent = report.buckets["urgent"]
+    soft_not_found = report.buckets["soft_404"]
+    redirected = report.buckets["redirected"]
+    server_errors = report.buckets["server_error"]
+    others = report.buckets["other"]
+    errors = report.buckets["error"]
+
+    # Output results in separate blocks.
+    if urgent:
+        print("\nThe following domain(s) responded with a HTTP 200 status code, so need checking urgently:\n", file=out)
+        for url, status in urgent:
+            print(f"{url}", file=out)
+
+    if soft_not_found:
+        print("\nThe following domain(s) responded with a HTTP 200 status code, but with the same page as for a missing file, so are probably fine:\n", file=out)
+        for url, status in soft_not_found:
+            print(f"{url}", file=out)
+
+    if redirected:
+        print("\nThe following domain(s) redirected and are probably fine:\n", file=out)
+        for url, status in redirected:
+            print(f"{url} - returned HTTP {status}", file=out)
+
+    if server_errors:
+        print("\nThere may have been an issue with the following domain(s):\n", file=out)
+        for url, status in server_errors:
+            print(f"{url} - returned HTTP {status}", file=out)
+
+    if others:
+        print("\nThe following domain(s) returned other status codes:\n", file=out)
+        for url, status in others:
+            print(f"{url} - returned HTTP {status}", file=out)
+
+    if errors:
+        print("\nThe script completed, but the following domains could not be checked:\n", file=out)
+        for url, error in errors:
+            print(f"{url} - {error}\n", file=out)
+
+def print_redirect_chains(report, out=None):
+    """Print the redirect chains followed for a ScanReport's results (with --resolve-redirects) to out."""
+    chains = report.chains
+    if chains:
+        print("\nThe following redirects were followed; results that stayed on the same path are those of the final target:\n", file=out)
+        for result in chains:
+            print(" -> ".join([result.url] + list(result.redirects)), file=out)
+
+def run(args, out=None, session=None, dns_cache=None, on_result=None, metrics=None):
+    """
+    Run a scan with the parsed command line options and write the report to out
+    (standard output by default). A long-lived caller such as the web UI can pass
+    in a warm session and DNS cache so connections and lookups are reused
+    across runs; otherwise both are built from args. on_result, if given, is
+    called with every ScanResult (404s included) as soon as it completes. Every
+    result, and the retry counters, are also added to metrics (a ScanMetrics),
+    if given; with --stats, one is made for the run to print its phase timings.
+
+    With a --format other than text, a record for every URL is written to out
+    as it completes instead of the report, and other messages go to standard
+    error. Only the results a webhook notification may need are kept.
+    """
+    from .checkpoint import Checkpoint
+    from .config import ScanConfig
+    from .distributed import address_from, coordinate, work
+    from .domain_loader import DomainDeduplicator, count_entries, iter_domains, with_www_variants
+    from .output_formats import build_record_writer
+    from .report import NOTIFY_BUCKETS
+    from .scan_metrics import ScanMetrics
+    from .scanner import Scanner
+
+    writer = build_record_writer(args.format, out if out is not None else sys.stdout)
+    notes = out if writer is None else sys.stderr
+
+    config = ScanConfig.from_args(args)
+    if args.worker:
+        # Workers only check domains; the coordinator keeps the results.
+        config = config.replace(store=None, checkpoint=None)
+    if metrics is None and args.stats:
+        metrics = ScanMetrics()
+    # One pooled session (and DNS cache, if enabled) is shared by every probe so
+    # connections and lookups are reused.
+    scanner = Scanner(config, session=session, dns_cache=dns_cache, metrics=metrics)
+    if args.worker:
+        # Check the coordinator's domains until its scan is over; it does the reporting.
+        completed = work(address_from(args.worker), args.authkey, scanner.scan_items)
+        scanner.close()
+        print(f"Worker finished after completing {completed} task(s).", file=notes)
+        return
+
+    # Load main domains and extend them to include both root and www versions.
+    # The domains are streamed and de-duplicated as they are read, so memory use
+    # doesn't grow with the length of the list.
+    domain_files = [args.file]
+
+    # If sub-domains flag is enabled, load additional sub-domains and extend them similarly.
+    if args.check_subdomains:
+        if os.path.exists("sub-domains.txt"):
+            domain_files.append("sub-domains.txt")
+            sub_domain_count = count_entries(with_www_variants(iter_domains("sub-domains.txt")))
+            print(f"Additionally, found {sub_domain_count} sub-domain entries to check.", file=notes)
+        else:
+            print("Sub-domains file 'sub-domains.txt' not found; skipping sub-domain checks.", file=notes)
+
+    deduplicator = DomainDeduplicator(args.dedup, capacity=args.expected_domains)
+    domains = deduplicator.filter(
+        itertools.chain.from_iterable(with_www_variants(iter_domains(filename)) for filename in domain_files)
+    )
+
+    checkpoint = Checkpoint(args.checkpoint, resume=args.resume, paths=scanner.paths) if args.checkpoint else None
+    backend = None
+    if args.coordinator:
+        # Hand the domains out to --worker processes instead of checking them here.
+        backend = partial(
+            coordinate,
+            address=address_from(args.coordinator),
+            authkey=args.authkey,
+            shards=args.shards,
+            shard_size=args.shard_size,
+            task_timeout=args.task_timeout
+        )
+
+    # Results from a resumed checkpoint are reported along with the new ones.
+    # With a structured --format every result is written out as it completes,
+    # so only those a webhook notification may need are kept for the report.
+    report = scanner.report(
+        previous=checkpoint.previous_results if checkpoint is not None else (),
+        keep=NOTIFY_BUCKETS if writer is not None else None
+    )
+    for result in scanner.scan(domains, checkpoint=checkpoint, backend=backend):
+        if on_result is not None:
+            on_result(result)
+        if writer is not None:
+            writer.write(result)
+        report.add(result)
+    if checkpoint is not None:
+        checkpoint.close()
+    scanner.close()
+    report.finish()
+
+    if writer is not None:
+        writer.close()
+    else:
+        print_report(report, out=out)
+        print_redirect_chains(report, out=out)
+
+    if args.stats:
+        print("\n" + "\n".join(report.statistics()), file=notes)
+    report.notify(out=notes)
+
+def main(argv=None):
+    """Parse the command line and run a scan."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if (args.coordinator or args.worker) and not args.authkey:
+        parser.error("--coordinator and --worker need a shared --authkey (or SCAN_AUTHKEY).")
+    check_backend_arguments(parser, args)
+    run(args)
@@ -0,0 +1,332 @@
+import ssl
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import DecodeError, HTTPError, NameResolutionError
+
+from .dns_cache import DnsError
+from .scan_metrics import record_phase
+
+class SessionStats:
+    """Thread-safe counters describing how well connections were reused during a run."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_resumed = 0
+        self.bodies_skipped = 0
+        self.bytes_avoided = 0
+
+    def increment(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    @property
+    def connections_reused(self):
+        return max(self.requests - self.connections_opened, 0)
+
+    def summary(self):
+        """Return a one-line, human readable summary of the counters."""
+        summary = (
+            f"{self.requests} request(s) over {self.connections_opened} new connection(s), "
+            f"{self.connections_reused} reused keep-alive connection(s), "
+            f"{self.tls_resumed} resumed TLS session(s)."
+        )
+        if self.bodies_skipped:
+            summary += (
+                f" {self.bodies_skipped} response(s) closed without reading the body, "
+                f"avoiding at least {self.bytes_avoided} byte(s) of downloads."
+            )
+        return summary
+
+class ResumingSSLContext(ssl.SSLContext):
+    """
+    SSLContext that offers the last TLS session seen for a host name when opening
+    a new connection to it, so a second connection to the same server (after the
+    pool dropped the first, or for a parallel request) can skip the full handshake.
+
+    A TLS 1.2 session is remembered as soon as the handshake is done. TLS 1.3
+    tickets only arrive after the handshake, so connections also call remember()
+    once a response has been read and before they are closed.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self.stats = None
+
+    def wrap_socket(self, sock, *args, server_hostname=None, session=None, **kwargs):
+        if session is None and server_hostname is not None:
+            with self._lock:
+                session = self._sessions.get(server_hostname)
+        try:
+            ssl_sock = super().wrap_socket(sock, *args, server_hostname=server_hostname, session=session, **kwargs)
+        except ValueError:
+            # The cached session can't be used (e.g. it belongs to another protocol
+            # version); fall back to a full handshake.
+            ssl_sock = super().wrap_socket(sock, *args, server_hostname=server_hostname, **kwargs)
+        if self.stats is not None and ssl_sock.session_reused:
+            self.stats.increment("tls_resumed")
+        self.remember(ssl_sock)
+        return ssl_sock
+
+    def remember(self, ssl_sock):
+        """Keep the TLS session of an open socket for its host name, if it can be resumed."""
+        hostname = getattr(ssl_sock, "server_hostname", None)
+        if hostname is None:
+            return
+        try:
+            session = ssl_sock.session
+            resumable = session is not None and (ssl_sock.version() != "TLSv1.3" or session.has_ticket)
+        except (OSError, ValueError, AttributeError):
+            return
+        if resumable:
+            with self._lock:
+                self._sessions[hostname] = session
+
+def build_ssl_context(ignore_ssl=False, stats=None):
+    """Create the TLS context shared by every connection in a session."""
+    context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    context.options |= ssl.OP_NO_COMPRESSION
+    if ignore_ssl:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    context.stats = stats
+    return context
+
+class _CountingConnectionMixin:
+    stats = None
+    dns_cache = None
+
+    _socket_seconds = None
+
+    def _new_conn(self):
+        started = time.monotonic()
+        sock = self._open_socket()
+        self._socket_seconds = time.monotonic() - started
+        return sock
+
+    def _open_socket(self):
+        if self.dns_cache is None:
+            started = time.monotonic()
+            try:
+                return super()._new_conn()
+            finally:
+                record_phase("connect", time.monotonic() - started)
+        # Connect to the cached address while keeping the host name for SNI,
+        # certificate checks and the Host header.
+        host = self._dns_host
+        started = time.monotonic()
+        try:
+            address = self.dns_cache.resolve(host)[0]
+        except DnsError as e:
+            raise NameResolutionError(self.host, self, e) from e
+        finally:
+            record_phase("dns", time.monotonic() - started)
+        self._dns_host = address
+        started = time.monotonic()
+        try:
+            return super()._new_conn()
+        finally:
+            self._dns_host = host
+            record_phase("connect", time.monotonic() - started)
+
+    def connect(self):
+        # Called for every new socket, including when the pool re-opens a
+        # connection object whose previous socket was closed by the server.
+        if self.stats is not None:
+            self.stats.increment("connections_opened")
+        started = time.monotonic()
+        self._socket_seconds = None
+        try:
+            super().connect()
+        finally:
+            if isinstance(self, HTTPSConnection) and self._socket_seconds is not None:
+                # Whatever connect() spent beyond opening the socket went on the TLS handshake.
+                record_phase("tls", max(time.monotonic() - started - self._socket_seconds, 0))
+
+    def getresponse(self, *args, **kwargs):
+        # The request has been sent; this waits for the status line and headers.
+        started = time.monotonic()
+        try:
+            return super().getresponse(*args, **kwargs)
+        finally:
+            record_phase("ttfb", time.monotonic() - started)
+            self._remember_tls_session()
+
+    def close(self):
+        self._remember_tls_session()
+        super().close()
+
+    def _remember_tls_session(self):
+        # By now any TLS 1.3 tickets the server sent have been read.
+        context = getattr(self, "ssl_context", None)
+        if isinstance(context, ResumingSSLContext) and isinstance(self.sock, ssl.SSLSocket):
+            context.remember(self.sock)
+
+# The counting classes keep urllib3's class names so error messages read the same
+# as they do without a shared session.
+_CountingHTTPConnection = type("HTTPConnection", (_CountingConnectionMixin, HTTPConnection), {})
+_CountingHTTPSConnection = type("HTTPSConnection", (_CountingConnectionMixin, HTTPSConnection), {})
+
+class _CountingPoolMixin:
+    stats = None
+    dns_cache = None
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn.stats = self.stats
+        conn.dns_cache = self.dns_cache
+        return conn
+
+class PooledAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that shares one TLS context between all of its connection pools
+    and counts how many connections it opens, so SessionStats can report reuse.
+    If a DnsCache is given, connections use its addresses instead of resolving.
+    """
+    def __init__(self, stats, ssl_context, dns_cache=None, **kwargs):
+        self.stats = stats
+        self.ssl_context = ssl_context
+        self.dns_cache = dns_cache
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs["ssl_context"] = self.ssl_context
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": type("HTTPConnectionPool", (_CountingPoolMixin, HTTPConnectionPool), {
+                "stats": self.stats, "dns_cache": self.dns_cache, "ConnectionCls": _CountingHTTPConnection
+            }),
+            "https": type("HTTPSConnectionPool", (_CountingPoolMixin, HTTPSConnectionPool), {
+                "stats": self.stats, "dns_cache": self.dns_cache, "ConnectionCls": _CountingHTTPSConnection
+            }),
+        }
+
+    def send(self, request, **kwargs):
+        self.stats.increment("requests")
+        return super().send(request, **kwargs)
+
+def build_session(pool_size=10, pool_hosts=100, keep_alive=True, ignore_ssl=False, stats=None,
+                  dns_cache=None):
+    """
+    Build a requests.Session to be shared by every probe in a run.
+
+    pool_size is the number of connections kept open per host and pool_hosts the
+    number of per-host pools kept before the least recently used one is closed.
+    With keep_alive disabled every request asks the server to close the connection.
+    Connections resolve host names through dns_cache when one is given.
+    The session's SessionStats are available as session.stats.
+    """
+    if stats is None:
+        stats = SessionStats()
+    adapter = PooledAdapter(
+        stats,
+        build_ssl_context(ignore_ssl=ignore_ssl, stats=stats),
+        dns_cache=dns_cache,
+        pool_connections=pool_hosts,
+        pool_maxsize=pool_size
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    session.stats = stats
+    return session
+
+# Status codes a server uses to say it doesn't support HEAD.
+HEAD_UNSUPPORTED_STATUSES = (405, 501)
+
+# Streamed bodies up to this size are read and discarded so the connection can go
+# back into the pool; anything larger (or of unknown length) is cheaper to drop.
+DRAIN_LIMIT = 16 * 1024
+
+def _skip_body(response, stats, read_body):
+    """Account for a response whose body was not needed, then release it."""
+    try:
+        length = int(response.headers.get("Content-Length", ""))
+    except ValueError:
+        length = None
+    if read_body and length is not None and length <= DRAIN_LIMIT:
+        # Small enough to drain, which keeps the keep-alive connection usable.
+        response.content
+        response.close()
+        return
+    response.close()
+    if stats is not None:
+        stats.increment("bodies_skipped")
+        if length:
+            stats.increment("bytes_avoided", length)
+
+def read_sample(response, sample_bytes):
+    """
+    Read the first sample_bytes of a streamed response's (decoded) body. Errors
+    reading it are raised as a requests.RequestException, like those of the
+    request.
+    """
+    try:
+        return response.raw.read(sample_bytes, decode_content=True) or b""
+    except DecodeError as e:
+        raise requests.exceptions.ContentDecodingError(e, response=response) from e
+    except (HTTPError, OSError) as e:
+        raise requests.exceptions.ChunkedEncodingError(e, response=response) from e
+
+def fetch_status(http, url, probe_mode="get", sample_bytes=0, **kwargs):
+    """
+    Request url with the given probe mode and return the response. Unless the
+    mode is "get", the body has already been skipped and only the status code
+    and headers are available.
+
+      - "get" downloads the whole response, as requests.get does.
+      - "stream" sends a GET but stops once the status line and headers are read.
+      - "head" sends a HEAD, falling back to a streamed GET if the server rejects
+        HEAD with 405 or 501.
+
+    With sample_bytes, the first sample_bytes of a HTTP 200 body are kept in
+    response.sample for the content classifier (in "stream" mode, only those
+    bytes are read); it is None for other responses and for HEAD requests.
+
+    http is a requests.Session (or the requests module itself). Any
+    requests.RequestException is left for the caller to handle; a malformed
+    Location header (which requests parses even when not following redirects)
+    is raised as one too.
+    """
+    try:
+        return _fetch_status(http, url, probe_mode, sample_bytes, **kwargs)
+    except ValueError as e:
+        raise requests.exceptions.InvalidURL(f"Invalid URL in response to {url}: {e}") from e
+
+def _fetch_status(http, url, probe_mode, sample_bytes, **kwargs):
+    stats = getattr(http, "stats", None)
+    if probe_mode == "head":
+        response = http.head(url, **kwargs)
+        if response.status_code not in HEAD_UNSUPPORTED_STATUSES:
+            response.sample = None
+            _skip_body(response, stats, read_body=False)
+            return response
+        response.close()
+        probe_mode = "stream"
+    if probe_mode == "stream":
+        response = http.get(url, stream=True, **kwargs)
+        response.sample = read_sample(response, sample_bytes) if sample_bytes and response.status_code == 200 else None
+        _skip_body(response, stats, read_body=True)
+        return response
+    response = http.get(url, **kwargs)
+    response.sample = response.content[:sample_bytes] if sample_bytes and response.status_code == 200 else None
+    return response
+
+def build_session_from_args(args, dns_cache=None):
+    """Build the shared session described by the command line options."""
+    return build_session(
+        pool_size=args.pool_size,
+        pool_hosts=args.pool_hosts,
+        keep_alive=not args.no_keep_alive,
+        ignore_ssl=args.ignore_ssl,
+        dns_cache=dns_cache
+    )
@@ -0,0 +1,131 @@
+import itertools
+import os
+import sys
+
+from .options import build_interactive_parser, check_backend_arguments
+
+# The interactive checker's command line options.
+build_parser = build_interactive_parser
+
+def run(args):
+    """
+    Run a scan with the parsed command line options, showing its progress on
+    standard output, and print the grouped results when it completes.
+    """
+    from .checkpoint import Checkpoint
+    from .config import ScanConfig
+    from .domain_loader import DomainDeduplicator, count_entries, iter_domains
+    from .scan_metrics import ScanMetrics
+    from .scanner import Scanner
+
+    # Domains are streamed from the file(s) and de-duplicated as they are read, so
+    # memory use doesn't grow with the length of the list.
+    domain_files = [args.file]
+
+    # If sub-domains flag is enabled, load additional sub-domains.
+    if args.check_subdomains:
+        if os.path.exists("sub-domains.txt"):
+            domain_files.append("sub-domains.txt")
+            print(f"Additionally, found {count_entries(iter_domains('sub-domains.txt'))} sub-domains to check.")
+        else:
+            print("Sub-domains file 'sub-domains.txt' not found; skipping sub-domain checks.")
+
+    total_domains = sum(count_entries(iter_domains(filename)) for filename in domain_files)
+    deduplicator = DomainDeduplicator(args.dedup, capacity=args.expected_domains)
+    domains = deduplicator.filter(
+        itertools.chain.from_iterable(iter_domains(filename) for filename in domain_files)
+    )
+
+    # One pooled session (and DNS cache, if enabled) is shared by every probe so
+    # connections and lookups are reused.
+    metrics = ScanMetrics() if args.stats else None
+    scanner = Scanner(ScanConfig.from_args(args), metrics=metrics)
+    paths = scanner.paths
+
+    # Pre-processing messages.
+    print(f"\nThere are {total_domains} domains to be checked.")
+    if len(paths) > 1:
+        print(f"Each domain will be checked for {len(paths)} paths: {', '.join(paths)}")
+    print("Please wait whilst the domains are checked.\n")
+
+    checkpoint = Checkpoint(args.checkpoint, resume=args.resume, paths=paths) if args.checkpoint else None
+
+    # Domains completed by a resumed run count towards the progress and their
+    # results are reported too.
+    report = scanner.report(previous=checkpoint.previous_results if checkpoint is not None else ())
+    already_completed = len(checkpoint.done) * len(paths) if checkpoint is not None else 0
+    total_checks = total_domains * len(paths)
+    spinner_chars = ["|", "/", "-", "\\"]
+    scan_results = scanner.scan(domains, checkpoint=checkpoint)
+    for completed, result in enumerate(scan_results, start=already_completed + 1):
+        report.add(result)
+        # Update progress indicator.
+        progress_percent = min(completed / total_checks, 1) * 100
+        spinner = spinner_chars[completed % len(spinner_chars)]
+        progress_message = f"{progress_percent:.0f}% complete {spinner}"
+        sys.stdout.write("\r" + progress_message)
+        sys.stdout.flush()
+    if deduplicator.duplicates:
+        # Skipped duplicates never complete, so finish the progress line here.
+        sys.stdout.write("\r100% complete  ")
+    print()  # New line after progress updates.
+    if checkpoint is not None:
+        checkpoint.close()
+    scanner.close()
+    if deduplicator.duplicates:
+        print(f"Skipped {deduplicator.duplicates} duplicate domain(s).")
+    report.finish()
+
+    # Output results in separate blocks.
+    urgent = report.buckets["urgent"]
+    if urgent:
+        print("\nThe following domain(s) responded with a HTTP 200 status code, so need checking urgently:\n")
+        for url, status in urgent:
+            print(f"{url} - this needs checking ASAP!")
+
+    soft_not_found = report.buckets["soft_404"]
+    if soft_not_found:
+        print("\nThe following domain(s) responded with a HTTP 200 status code, but with the same page as for a missing file, so are probably fine:\n")
+        for url, status in soft_not_found:
+            print(f"{url} looks like a soft 404")
+
+    redirected = report.buckets["redirected"]
+    if redirected:
+        print("\nThe following domain(s) redirected and are probably fine:\n")
+        for url, status in redirected:
+            print(f"{url} returned status code {status}")
+
+    server_errors = report.buckets["server_error"]
+    if server_errors:
+        print("\nThere may have been an issue with the following domain(s):\n")
+        for url, status in server_errors:
+            print(f"{url} returned status code {status}")
+
+    others = report.buckets["other"]
+    if others:
+        print("\nThe following domain(s) returned other status codes:\n")
+        for url, status in others:
+            print(f"{url} returned status code {status}")
+
+    errors = report.buckets["error"]
+    if errors:
+        print("\nThe script completed, but the following issues were found:\n")
+        for url, error in errors:
+            print(f"{url}: {error}")
+
+    chains = report.chains
+    if chains:
+        print("\nThe following redirects were followed; results that stayed on the same path are those of the final target:\n")
+        for result in chains:
+            print(" -> ".join([result.url] + list(result.redirects)))
+
+    if args.stats:
+        print("\n" + "\n".join(report.statistics()))
+    report.notify()
+
+def main(argv=None):
+    """Parse the command line and run a scan."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    check_backend_arguments(parser, args)
+    run(args)
@@ -0,0 +1,408 @@
+import argparse
+import os
+
+from .config import DEFAULTS
+
+# Values some options are limited to.
+PROBE_MODES = ("get", "head", "stream")
+FORMATS = ("text", "ndjson", "json", "csv")
+
+# Port of a --coordinator / --worker address that doesn't give one.
+DEFAULT_PORT = 50000
+
+# The command line options of both front-ends. They only need the standard
+# library, so --help and argument errors don't wait for requests and the rest
+# of the scanner to be imported.
+
+def add_common_arguments(parser):
+    """Add the options both command line scripts have always had."""
+    parser.add_argument(
+        "-f", "--file",
+        type=str,
+        default=DEFAULTS.file,
+        help="Path to the file containing domains (one per line). Default is domains.txt."
+    )
+    parser.add_argument(
+        "--ignore-ssl",
+        action="store_true",
+        help="Ignore SSL warnings and disable SSL certificate verification."
+    )
+    parser.add_argument(
+        "--follow-redirects",
+        action="store_true",
+        help="Follow redirects when checking the /info.php URL. By default, redirects are not followed."
+    )
+    parser.add_argument(
+        "--check-subdomains",
+        action="store_true",
+        help="Also check sub-domains listed in sub-domains.txt."
+    )
+    parser.add_argument(
+        "--webhook-url",
+        type=str,
+        help="URL of the webhook to send urgent domain notifications (e.g., Teams webhook URL)."
+    )
+
+def add_loader_arguments(parser):
+    """Add the domain list options shared by both command line scripts."""
+    parser.add_argument(
+        "--dedup",
+        choices=["set", "bloom", "none"],
+        default=DEFAULTS.dedup,
+        help="How repeated domains are skipped: an exact set (default), a fixed-size "
+             "Bloom filter for very large lists, or not at all."
+    )
+    parser.add_argument(
+        "--expected-domains",
+        type=int,
+        default=DEFAULTS.expected_domains,
+        help="Number of domains the Bloom filter is sized for with --dedup bloom. Default is 10000000."
+    )
+
+def add_engine_arguments(parser):
+    """Add the scan engine options shared by both command line scripts."""
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULTS.concurrency,
+        help="Number of domains to check in parallel. Default is 1 (one at a time)."
+    )
+    parser.add_argument(
+        "--paths-file",
+        type=str,
+        help="Path to a file listing the paths to check on every domain (one per line, "
+             "e.g. /info.php, /.env). By default only /info.php is checked."
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["threads", "asyncio"],
+        default=DEFAULTS.backend,
+        help="Probe implementation to use. The asyncio backend can keep thousands of "
+             "requests in flight on one thread. Default is threads."
+    )
+    parser.add_argument(
+        "--per-host-limit",
+        type=int,
+        default=DEFAULTS.per_host_limit,
+        help="With the asyncio backend, the maximum number of concurrent requests to a "
+             "single IP address or registrable domain. Default is 4."
+    )
+
+def add_session_arguments(parser):
+    """Add the HTTP session options shared by both command line scripts."""
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=DEFAULTS.pool_size,
+        help="Number of keep-alive connections kept open per host. Default is 10."
+    )
+    parser.add_argument(
+        "--pool-hosts",
+        type=int,
+        default=DEFAULTS.pool_hosts,
+        help="Number of hosts to keep connection pools for. Default is 100."
+    )
+    parser.add_argument(
+        "--no-keep-alive",
+        action="store_true",
+        help="Close each connection after a single request instead of reusing it."
+    )
+    parser.add_argument(
+        "--probe-mode",
+        choices=PROBE_MODES,
+        default=DEFAULTS.probe_mode,
+        help="How each URL is requested: a full GET, a HEAD (falling back to GET when the "
+             "server rejects it) or a streamed GET that stops after the headers. The asyncio backend "
+             "always sends a GET. Default is get."
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print connection reuse statistics and a summary of the time spent in each "
+             "phase of the checks (DNS, connect, TLS, time to first byte) at the end of the run."
+    )
+
+def add_dns_arguments(parser):
+    """Add the DNS pre-resolution options shared by both command line scripts."""
+    parser.add_argument(
+        "--pre-resolve",
+        action="store_true",
+        help="Resolve all host names up front. Names that don't exist are reported "
+             "straight away instead of being requested."
+    )
+    parser.add_argument(
+        "--dns-server",
+        type=str,
+        help="Send DNS queries to this server (HOST or HOST:PORT) instead of using the "
+             "system resolver. Useful with a local stub DNS server."
+    )
+    parser.add_argument(
+        "--dns-concurrency",
+        type=int,
+        default=DEFAULTS.dns_concurrency,
+        help="Number of host names to resolve in parallel with --pre-resolve. Default is 50."
+    )
+
+def add_store_arguments(parser):
+    """Add the result store options shared by both command line scripts."""
+    parser.add_argument(
+        "--store",
+        type=str,
+        help="Path to an SQLite database that keeps the result of every URL between runs. "
+             "When set, webhook notifications are only sent for URLs that have newly "
+             "become urgent or have been fixed since the last run."
+    )
+    parser.add_argument(
+        "--changed-only",
+        action="store_true",
+        help="With --store, use conditional requests (ETag / Last-Modified) to cheaply "
+             "revalidate URLs whose result is already known. Not supported by the asyncio backend."
+    )
+    parser.add_argument(
+        "--recheck-after",
+        type=int,
+        default=DEFAULTS.recheck_after,
+        help="With --changed-only, skip URLs that were checked less than this many seconds "
+             "ago and reuse their stored result. Default is 0 (always revalidate)."
+    )
+
+def add_checkpoint_arguments(parser):
+    """Add the checkpoint options shared by both command line scripts."""
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        help="Path to a file that completed checks are appended to as the scan runs, "
+             "so an interrupted scan can be resumed with --resume."
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="With --checkpoint, skip the domains already completed in the checkpoint "
+             "file and include their results in the report."
+    )
+
+def add_retry_arguments(parser):
+    """Add the timeout and retry options shared by both command line scripts."""
+    parser.add_argument(
+        "--connect-timeout",
+        type=float,
+        default=DEFAULTS.connect_timeout,
+        help="Seconds to wait for a connection to be established. Default is 5."
+    )
+    parser.add_argument(
+        "--read-timeout",
+        type=float,
+        default=DEFAULTS.read_timeout,
+        help="Seconds to wait for the server to respond. Default is 5."
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULTS.retries,
+        help="Number of times to retry a request that failed with a transient error "
+             "(timeout or connection failure), with exponential backoff. Default is 0."
+    )
+    parser.add_argument(
+        "--backoff",
+        type=float,
+        default=DEFAULTS.backoff,
+        help="Delay in seconds before the first retry; it doubles for each further retry. Default is 0.5."
+    )
+    parser.add_argument(
+        "--adaptive-timeouts",
+        action="store_true",
+        help="Shorten the first attempt's timeouts based on the latencies observed so far "
+             "(retries always use the full timeouts)."
+    )
+    parser.add_argument(
+        "--breaker-threshold",
+        type=int,
+        default=DEFAULTS.breaker_threshold,
+        help="Stop contacting a host after this many consecutive failures. Default is 0 (disabled)."
+    )
+
+def add_rate_limit_arguments(parser):
+    """Add the rate limiting options shared by both command line scripts."""
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        default=DEFAULTS.max_rate,
+        help="Maximum requests per second across all hosts. Default is 0 (unlimited)."
+    )
+    parser.add_argument(
+        "--per-domain-rate",
+        type=float,
+        default=DEFAULTS.per_domain_rate,
+        help="Maximum requests per second to any one registrable domain (example.co.uk and all "
+             "of its sub-domains). Default is 0 (unlimited)."
+    )
+    parser.add_argument(
+        "--per-ip-rate",
+        type=float,
+        default=DEFAULTS.per_ip_rate,
+        help="Maximum requests per second to any one resolved IP address, e.g. a load balancer "
+             "in front of many hosts. Default is 0 (unlimited)."
+    )
+    parser.add_argument(
+        "--rate-burst",
+        type=int,
+        default=DEFAULTS.rate_burst,
+        help="Number of requests that may be sent at once before the rate limits apply. Default is 1."
+    )
+
+def add_redirect_arguments(parser):
+    """Add the redirect resolution options shared by both command line scripts."""
+    parser.add_argument(
+        "--resolve-redirects",
+        action="store_true",
+        help="Follow redirects one hop at a time, recording the chain, and report the final "
+             "target's response in the usual groups instead of as redirected. Targets shared "
+             "by several domains (such as their www. host) are only requested once per run."
+    )
+    parser.add_argument(
+        "--max-redirects",
+        type=int,
+        default=DEFAULTS.max_redirects,
+        help="With --resolve-redirects, the longest chain followed before giving up. Default is 10."
+    )
+
+def add_classifier_arguments(parser):
+    """Add the content verification options shared by both command line scripts."""
+    parser.add_argument(
+        "--verify-content",
+        action="store_true",
+        help="Look at the first few KB of every HTTP 200 response for the real content of "
+             "the path, and treat responses that match the host's page for a missing path "
+             "as soft 404s instead of urgent."
+    )
+    parser.add_argument(
+        "--sample-bytes",
+        type=int,
+        default=DEFAULTS.sample_bytes,
+        help="With --verify-content, how much of each response is read. Default is 4096."
+    )
+
+def add_webhook_arguments(parser):
+    """Add the webhook delivery options shared by both command line scripts."""
+    parser.add_argument(
+        "--webhook-max-bytes",
+        type=int,
+        default=DEFAULTS.webhook_max_bytes,
+        help="Largest webhook card to send, in bytes of JSON; longer lists of alerts are split "
+             f"over several cards. Default is {DEFAULTS.webhook_max_bytes}."
+    )
+    parser.add_argument(
+        "--webhook-retries",
+        type=int,
+        default=DEFAULTS.webhook_retries,
+        help="Number of times to retry a webhook card after a connection error, HTTP 429 or "
+             "server error, with exponential backoff. Default is 3."
+    )
+    parser.add_argument(
+        "--webhook-rate",
+        type=float,
+        default=DEFAULTS.webhook_rate,
+        help="Maximum webhook cards sent per second. Default is 1."
+    )
+    parser.add_argument(
+        "--webhook-dedup-window",
+        type=float,
+        default=DEFAULTS.webhook_dedup_window,
+        help="Leave out alerts for URLs already sent to the webhook in this many seconds "
+             "(remembered in --webhook-state between runs). Default is 0 (send every alert)."
+    )
+    parser.add_argument(
+        "--webhook-state",
+        type=str,
+        default=DEFAULTS.webhook_state,
+        help="SQLite database recording which alerts were sent, for --webhook-dedup-window. "
+             "Default is webhook_state.db."
+    )
+
+def add_output_arguments(parser):
+    """Add the output format option of the headless checker."""
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default=DEFAULTS.format,
+        help="Output format. \"text\" prints the grouped report at the end of the run; "
+             "ndjson, json and csv write one record per URL (url, status, error, elapsed, "
+             "bucket, phase timings, ...) to standard output as soon as it has been checked, with any "
+             "other messages going to standard error. Default is text."
+    )
+
+def add_distributed_arguments(parser):
+    """Add the coordinator / worker options of the headless checker."""
+    parser.add_argument(
+        "--coordinator",
+        metavar="HOST[:PORT]",
+        help="Don't check the domains here, but serve them to workers started with --worker, "
+             f"listening on this address (default port {DEFAULT_PORT}). The results are "
+             "reported here as usual."
+    )
+    parser.add_argument(
+        "--worker",
+        metavar="HOST[:PORT]",
+        help="Check domains handed out by the coordinator at this address until its scan is finished."
+    )
+    parser.add_argument(
+        "--authkey",
+        default=os.environ.get("SCAN_AUTHKEY"),
+        help="Shared secret for --coordinator and --worker. Defaults to the SCAN_AUTHKEY environment variable."
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=DEFAULTS.shards,
+        help="With --coordinator, the number of shards host names are hashed into. Default is 64."
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=DEFAULTS.shard_size,
+        help="With --coordinator, the number of domains handed to a worker at a time. Default is 100."
+    )
+    parser.add_argument(
+        "--task-timeout",
+        type=float,
+        default=DEFAULTS.task_timeout,
+        help="With --coordinator, seconds after which unfinished domains are handed to another worker. "
+             "Default is 600."
+    )
+
+def _build_parser():
+    parser = argparse.ArgumentParser(
+        description="Check domains for /info.php and report those that do not return HTTP 404."
+    )
+    add_common_arguments(parser)
+    add_loader_arguments(parser)
+    add_engine_arguments(parser)
+    add_session_arguments(parser)
+    add_dns_arguments(parser)
+    add_store_arguments(parser)
+    add_checkpoint_arguments(parser)
+    add_retry_arguments(parser)
+    add_rate_limit_arguments(parser)
+    add_redirect_arguments(parser)
+    add_classifier_arguments(parser)
+    add_webhook_arguments(parser)
+    return parser
+
+def check_backend_arguments(parser, args):
+    """Exit with a usage error if an option was given that the selected --backend doesn't support."""
+    if args.backend == "asyncio":
+        if args.probe_mode != "get":
+            parser.error("--probe-mode is not supported by the asyncio backend, which always sends a GET.")
+        if args.changed_only:
+            parser.error("--changed-only is not supported by the asyncio backend.")
+
+def build_interactive_parser():
+    """Return the argument parser of domain_checker.py."""
+    return _build_parser()
+
+def build_headless_parser():
+    """Return the argument parser of headless_checker.py, which adds output formats and distributed scans."""
+    parser = _build_parser()
+    add_output_arguments(parser)
+    add_distributed_arguments(parser)
+    return parser
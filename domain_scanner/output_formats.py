@@ -0,0 +1,84 @@
+import csv
+import json
+
+from .scan_engine import result_bucket, target_url
+from .scan_metrics import PHASES
+
+# Fields of every machine-readable record, in CSV column order. The phase fields
+# are the seconds spent in each phase of the check (None if it didn't happen).
+RECORD_FIELDS = ("url", "status", "error", "elapsed", "bucket", "domain", "path", "verdict") + PHASES + (
+    "final_url", "redirects"
+)
+
+def result_record(result):
+    """
+    Return the machine-readable record for a ScanResult. Every URL checked gets
+    one, including those that returned the desired 404 (bucket "not_found").
+    """
+    timings = result.timings or {}
+    record = {
+        "url": result.url if result.url is not None else target_url(result.domain, result.path),
+        "status": 404 if result.url is None else result.status,
+        "error": result.error,
+        "elapsed": round(result.elapsed, 3) if result.elapsed is not None else None,
+        "bucket": result_bucket(result),
+        "domain": result.domain,
+        "path": result.path,
+        "verdict": result.verdict
+    }
+    for phase in PHASES:
+        record[phase] = round(timings[phase], 3) if phase in timings else None
+    # With --resolve-redirects, the chain of URLs redirected to and the one whose response was reported.
+    record["final_url"] = result.redirects[-1] if result.redirects else record["url"]
+    record["redirects"] = list(result.redirects or [])
+    return record
+
+class NdjsonWriter:
+    """Write one JSON object per line, flushed as each result completes."""
+    def __init__(self, out):
+        self.out = out
+
+    def write(self, result):
+        self.out.write(json.dumps(result_record(result)) + "\n")
+        self.out.flush()
+
+    def close(self):
+        pass
+
+class JsonWriter:
+    """Write a single JSON array, one element per result, without holding the results in memory."""
+    def __init__(self, out):
+        self.out = out
+        self._separator = "[\n"
+
+    def write(self, result):
+        self.out.write(self._separator + json.dumps(result_record(result)))
+        self.out.flush()
+        self._separator = ",\n"
+
+    def close(self):
+        self.out.write("[]\n" if self._separator == "[\n" else "\n]\n")
+        self.out.flush()
+
+class CsvWriter:
+    """Write a CSV header and then one row per result as it completes."""
+    def __init__(self, out):
+        self.out = out
+        self._writer = csv.DictWriter(out, fieldnames=RECORD_FIELDS)
+        self._writer.writeheader()
+
+    def write(self, result):
+        record = result_record(result)
+        record["redirects"] = " ".join(record["redirects"])
+        self._writer.writerow(record)
+        self.out.flush()
+
+    def close(self):
+        pass
+
+def build_record_writer(output_format, out):
+    """Return the record writer for an output format, or None for the text report."""
+    writers = {"ndjson": NdjsonWriter, "json": JsonWriter, "csv": CsvWriter}
+    if output_format not in writers:
+        return None
+    return writers[output_format](out)
@@ -0,0 +1,196 @@
+import asyncio
+import email.utils
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .domain_loader import registrable_domain
+
+# Statuses whose Retry-After header pauses further requests to the domain.
+RETRY_AFTER_STATUSES = (429, 503)
+
+def parse_retry_after(value, max_wait=300):
+    """
+    Return the number of seconds a Retry-After header asks to wait (given as
+    seconds or as an HTTP date), capped at max_wait, or None if it is invalid.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        seconds = int(value)
+    else:
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when is None:
+            return None
+        seconds = when.timestamp() - time.time()
+    return min(max(seconds, 0), max_wait)
+
+class TokenBucket:
+    """
+    Token bucket allowing `rate` requests per second on average, with bursts of
+    up to `burst`. reserve() takes a token straight away, even if that leaves the
+    bucket in debt, and returns how long the caller must wait before using it,
+    so concurrent callers are spaced out without polling.
+    """
+    def __init__(self, rate, burst=1, now=None):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic() if now is None else now
+
+    def reserve(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def is_idle(self, now):
+        """Return True if the bucket has refilled completely (and so can be dropped)."""
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+class RateLimiter:
+    """
+    Request rate caps shared by every probe: a global requests/sec cap, and caps
+    per registrable domain and per resolved IP address (0 disables a cap). A
+    429 or 503 response with a Retry-After header pauses every request to its
+    registrable domain for that long.
+
+    The time probes spent waiting is counted in throttled_seconds (and the
+    number of requests that had to wait in throttled_requests).
+    """
+    def __init__(self, global_rate=0, per_domain_rate=0, per_ip_rate=0, burst=1, dns_cache=None,
+                 max_retry_after=300):
+        self.global_rate = global_rate
+        self.per_domain_rate = per_domain_rate
+        self.per_ip_rate = per_ip_rate
+        self.burst = burst
+        self.dns_cache = dns_cache
+        self.max_retry_after = max_retry_after
+        self._global = TokenBucket(global_rate, burst) if global_rate else None
+        self._buckets = {}
+        self._paused_until = {}
+        self._lock = threading.Lock()
+        self._reservations = 0
+        self.requests = 0
+        self.throttled_requests = 0
+        self.throttled_seconds = 0.0
+        self.retry_after_pauses = 0
+
+    def _address(self, host):
+        if not self.per_ip_rate or self.dns_cache is None:
+            return None
+        from .dns_cache import DnsError
+        try:
+            return self.dns_cache.resolve(host)[0]
+        except DnsError:
+            return None
+
+    def _bucket(self, key, rate, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, self.burst, now)
+        return bucket
+
+    def reserve(self, host, address=None):
+        """Reserve a request to host and return how many seconds to wait before sending it."""
+        domain = registrable_domain(host)
+        if address is None:
+            address = self._address(host)
+        now = time.monotonic()
+        with self._lock:
+            waits = [self._paused_until.get(domain, now) - now]
+            if self._global is not None:
+                waits.append(self._global.reserve(now))
+            if self.per_domain_rate:
+                waits.append(self._bucket("domain:" + domain, self.per_domain_rate, now).reserve(now))
+            if self.per_ip_rate and address is not None:
+                waits.append(self._bucket("ip:" + address, self.per_ip_rate, now).reserve(now))
+            wait = max(waits)
+            self.requests += 1
+            if wait > 0:
+                self.throttled_requests += 1
+                self.throttled_seconds += wait
+            self._reservations += 1
+            if self._reservations % 10000 == 0:
+                self._forget_idle(now)
+        return max(wait, 0)
+
+    def _forget_idle(self, now):
+        # A full bucket behaves like a new one, so idle hosts needn't be remembered.
+        for key in [key for key, bucket in self._buckets.items() if bucket.is_idle(now)]:
+            del self._buckets[key]
+        for domain in [domain for domain, until in self._paused_until.items() if until <= now]:
+            del self._paused_until[domain]
+
+    def acquire(self, host, address=None):
+        """Wait (in this thread) until a request to host may be sent."""
+        wait = self.reserve(host, address)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, host, address=None):
+        """Wait (without blocking the event loop) until a request to host may be sent."""
+        wait = self.reserve(host, address)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def note_response(self, host, status, retry_after):
+        """
+        Pause requests to host's registrable domain if a 429/503 asked us to
+        retry later, and return the pause in seconds (None if there is none).
+        """
+        if status not in RETRY_AFTER_STATUSES:
+            return None
+        seconds = parse_retry_after(retry_after, self.max_retry_after)
+        if not seconds:
+            return None
+        domain = registrable_domain(host)
+        until = time.monotonic() + seconds
+        with self._lock:
+            if until > self._paused_until.get(domain, 0):
+                self._paused_until[domain] = until
+                self.retry_after_pauses += 1
+        return seconds
+
+    def wrap(self, url, request):
+        """
+        Return a version of request (a fetch_status partial taking timeout=...,
+        or anything else returning an object with status_code and headers) that
+        waits for the rate limits before each call and honours Retry-After.
+        Under a RetryPolicy, pass the limiter to RetryPolicy.run instead, so the
+        wait isn't timed as part of the request.
+        """
+        host = urlsplit(url).hostname or ""
+
+        def limited(**kwargs):
+            self.acquire(host)
+            response = request(**kwargs)
+            self.note_response(host, response.status_code, response.headers.get("Retry-After"))
+            return response
+        return limited
+
+    def summary(self):
+        """Return a one-line, human readable summary of the time spent throttled."""
+        return (
+            f"{self.throttled_requests} of {self.requests} request(s) were throttled for "
+            f"{self.throttled_seconds:.1f}s in total, {self.retry_after_pauses} Retry-After pause(s)."
+        )
+
+def build_rate_limiter_from_args(args, dns_cache=None):
+    """
+    Build the RateLimiter described by the command line options, or None if no
+    limit is set. Retry-After is only honoured when some limit is set.
+    """
+    if not (args.max_rate or args.per_domain_rate or args.per_ip_rate):
+        return None
+    return RateLimiter(
+        global_rate=args.max_rate,
+        per_domain_rate=args.per_domain_rate,
+        per_ip_rate=args.per_ip_rate,
+        burst=args.rate_burst,
+        dns_cache=dns_cache
+    )
@@ -0,0 +1,172 @@
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import contextvars
+import threading
+from urllib.parse import urljoin, urlsplit
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+# The URLs redirected to by the check running in the current thread or task.
+_redirects = contextvars.ContextVar("redirects", default=None)
+
+@contextlib.contextmanager
+def recording_redirects():
+    """Collect the URLs redirected to by the check made inside the block, in a list that is yielded."""
+    redirects = []
+    token = _redirects.set(redirects)
+    try:
+        yield redirects
+    finally:
+        _redirects.reset(token)
+
+def redirect_target(url, location):
+    """Return the URL a Location header on url's response points to, raising ConnectionError if it is malformed."""
+    try:
+        target = urljoin(url, location)
+        urlsplit(target).port
+    except ValueError as e:
+        raise ConnectionError(f"Invalid redirect to {location!r}: {e}") from e
+    return target
+
+def record_redirects(urls):
+    """Add the URLs a check was redirected to, if recording_redirects() is collecting them."""
+    redirects = _redirects.get()
+    if redirects is not None:
+        redirects.extend(urls)
+
+class RedirectResolver:
+    """
+    Follows redirects one hop at a time, so the chain from each checked URL to
+    its final target can be recorded, and remembers the responses of the URLs
+    redirected to. Many domains redirect to the same target (example.com/info.php
+    to www.example.com/info.php, which is checked anyway), and that target is
+    then requested only once: concurrent callers for the same URL share a single
+    request, as ContentClassifier baselines do. The URLs checked directly are
+    answered from what is remembered but not added to it, and only the
+    max_entries most recently used targets are kept, so memory use doesn't
+    grow with the length of the domain list.
+
+    Only a final response for the same path is reported in place of the
+    redirect: a chain that leaves the path (such as a redirect of every unknown
+    path to the home page) is reported with the status of its first redirect.
+
+    fetch(url) sends one request without following redirects and returns
+    (status, location). An OSError it raises (requests.RequestException is one)
+    ends the chain with that error, which is remembered like a response.
+    """
+    def __init__(self, max_redirects=10, max_entries=100_000):
+        self.max_redirects = max_redirects
+        self.max_entries = max_entries
+        self._hops = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.chains = 0
+        self.requests = 0
+        self.reused = 0
+
+    def _claim(self, url, remember):
+        """
+        Return (future, owner) for url's hop; the owner must make the request
+        and set its result. If remember is true, later callers share it.
+        """
+        with self._lock:
+            future = self._hops.get(url)
+            owner = future is None
+            if owner:
+                future = concurrent.futures.Future()
+                self.requests += 1
+                if remember:
+                    self._hops[url] = future
+                    if len(self._hops) > self.max_entries:
+                        self._hops.popitem(last=False)
+            else:
+                self._hops.move_to_end(url)
+                self.reused += 1
+        return future, owner
+
+    def _next(self, chain, url, status, location):
+        """Return the URL a hop redirects to, or None if it is the final response."""
+        if status not in REDIRECT_STATUSES or not location:
+            return None
+        target = redirect_target(url, location)
+        if target in chain:
+            raise ConnectionError(f"Redirect loop back to {target}.")
+        if len(chain) > self.max_redirects:
+            raise ConnectionError(f"Exceeded {self.max_redirects} redirects.")
+        return target
+
+    def _outcome(self, chain, first_status, status, error):
+        """Return the (status, error, redirects) reported for a resolved chain."""
+        if len(chain) > 1 and urlsplit(chain[-1]).path != urlsplit(chain[0]).path:
+            return first_status, None, chain[1:]
+        return status, error, chain[1:]
+
+    def resolve(self, url, fetch):
+        """
+        Follow the redirects from url and return (status, error, redirects):
+        the final response's status (or the error that ended the chain), unless
+        the chain left url's path, and the URLs redirected to, in order.
+        """
+        with self._lock:
+            self.chains += 1
+        chain = [url]
+        first_status = None
+        try:
+            while True:
+                future, owner = self._claim(url, remember=len(chain) > 1)
+                if owner:
+                    try:
+                        future.set_result(fetch(url))
+                    except BaseException as e:
+                        # Remembered (and raised again below) for every caller of this URL.
+                        future.set_exception(e)
+                status, location = future.result()
+                if first_status is None:
+                    first_status = status
+                target = self._next(chain, url, status, location)
+                if target is None:
+                    return self._outcome(chain, first_status, status, None)
+                chain.append(target)
+                url = target
+        except OSError as e:
+            return self._outcome(chain, first_status, None, str(e))
+
+    async def aresolve(self, url, fetch):
+        """resolve() for the asyncio backend, where fetch(url) is a coroutine function."""
+        with self._lock:
+            self.chains += 1
+        chain = [url]
+        first_status = None
+        try:
+            while True:
+                future, owner = self._claim(url, remember=len(chain) > 1)
+                if owner:
+                    try:
+                        future.set_result(await fetch(url))
+                    except BaseException as e:
+                        # Remembered (and raised again below) for every caller of this URL.
+                        future.set_exception(e)
+                status, location = await asyncio.wrap_future(future)
+                if first_status is None:
+                    first_status = status
+                target = self._next(chain, url, status, location)
+                if target is None:
+                    return self._outcome(chain, first_status, status, None)
+                chain.append(target)
+                url = target
+        except OSError as e:
+            return self._outcome(chain, first_status, None, str(e))
+
+    def summary(self):
+        """Return a one-line summary of the chains resolved and the requests saved."""
+        return (
+            f"{self.chains} redirect chain(s) resolved with {self.requests} request(s), "
+            f"{self.reused} hop(s) answered from earlier requests."
+        )
+
+def build_redirect_resolver_from_args(args):
+    """Build the RedirectResolver described by the command line options, or None without --resolve-redirects."""
+    if not args.resolve_redirects:
+        return None
+    return RedirectResolver(max_redirects=args.max_redirects)
@@ -0,0 +1,108 @@
+from .scan_engine import result_bucket
+from .webhook import build_notifier_from_args, send_webhook_notification
+
+# The report's buckets, in the order the front-ends print them. 404s (the
+# "not_found" bucket) are the desired response and are never reported.
+BUCKETS = ("urgent", "soft_404", "redirected", "server_error", "other", "error")
+
+# The buckets a webhook notification needs.
+NOTIFY_BUCKETS = ("urgent", "redirected")
+
+class ScanReport:
+    """
+    The outcome of a Scanner's scan, for a front-end to print: its results
+    grouped into report buckets, the --stats summary of the scanner and the
+    webhook notification the scan calls for.
+
+    add() every result as it completes (404s are dropped), then call finish()
+    once the scan is over and the scanner is closed. With keep, only results
+    in those buckets are kept, so a run that streams every result elsewhere
+    (a structured --format) doesn't hold them all in memory.
+
+        report = scanner.report()
+        for result in scanner.scan(domains):
+            report.add(result)
+        scanner.close()
+        report.finish()
+        for url, status in report.buckets["urgent"]:
+            print(url)
+    """
+    def __init__(self, scanner, previous=(), keep=None):
+        self.scanner = scanner
+        self.keep = keep
+        self.results = []
+        self.buckets = {bucket: [] for bucket in BUCKETS}
+        for result in previous:
+            self.add(result)
+
+    def add(self, result):
+        """Keep a result for the report, unless it is a 404 or in a bucket that isn't kept."""
+        if result.url is None:
+            return
+        if self.keep is not None and result_bucket(result) not in self.keep:
+            return
+        self.results.append(result)
+
+    def finish(self):
+        """
+        Sort the results back into input order, by domain and then path (probes
+        and classifications complete out of order), and group them into the
+        buckets as (url, status) tuples, or (url, error) in the "error" bucket.
+        Returns the report.
+        """
+        positions = {path: position for position, path in enumerate(self.scanner.paths)}
+        self.results.sort(key=lambda result: (result.index, positions.get(result.path, len(positions))))
+        for result in self.results:
+            bucket = result_bucket(result)
+            self.buckets[bucket].append((result.url, result.error if bucket == "error" else result.status))
+        return self
+
+    @property
+    def chains(self):
+        """The results for which redirects were followed (with --resolve-redirects)."""
+        return [result for result in self.results if result.redirects]
+
+    def statistics(self):
+        """
+        Return the lines of the --stats summary: connection reuse (threads
+        backend), retries, rate limiting, redirects and phase timings.
+        """
+        scanner = self.scanner
+        lines = []
+        if scanner.args.backend == "threads":
+            lines.append("Connection statistics: " + scanner.session.stats.summary())
+        lines.append("Retry statistics: " + scanner.policy.summary())
+        if scanner.limiter is not None:
+            lines.append("Rate limiting: " + scanner.limiter.summary())
+        if scanner.resolver is not None:
+            lines.append("Redirects: " + scanner.resolver.summary())
+        if scanner.metrics is not None:
+            lines.append("Phase timings:\n" + scanner.metrics.summary())
+        return lines
+
+    def notify(self, out=None):
+        """
+        Send the webhook notification the scan calls for, if a webhook URL is
+        set. With a result store, the number of URLs that newly need checking or
+        have been fixed since the last run is written to out, and only those
+        changes are alerted on; otherwise every urgent URL is. Messages are
+        written to out (standard output by default).
+        """
+        args = self.scanner.args
+        store = self.scanner.store
+        if store is not None:
+            print(
+                f"\n{len(store.newly_urgent)} domain(s) newly need checking and "
+                f"{len(store.newly_fixed)} domain(s) have been fixed since the last run.",
+                file=out
+            )
+            if (store.newly_urgent or store.newly_fixed) and args.webhook_url:
+                self._send(store.newly_urgent, [], fixed_list=store.newly_fixed, out=out)
+        elif self.buckets["urgent"] and args.webhook_url:
+            self._send(self.buckets["urgent"], self.buckets["redirected"], out=out)
+
+    def _send(self, urgent, redirected, fixed_list=None, out=None):
+        args = self.scanner.args
+        notifier = build_notifier_from_args(args)
+        send_webhook_notification(urgent, redirected, args.webhook_url, fixed_list=fixed_list, out=out, notifier=notifier)
+        notifier.close()
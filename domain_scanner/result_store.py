@@ -0,0 +1,166 @@
+import sqlite3
+import threading
+import time
+
+from .content_classifier import SOFT_404
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    url TEXT PRIMARY KEY,
+    status INTEGER,
+    error TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    first_seen REAL NOT NULL,
+    status_since REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    verdict TEXT
+)
+"""
+
+# HTTP 404 is stored for URLs that returned the desired response, so a URL that
+# goes from 200 to 404 can be reported as fixed.
+NOT_FOUND = 404
+
+def is_urgent(status, verdict):
+    """Return True if a stored status and verdict need someone's attention."""
+    return status == 200 and verdict != SOFT_404
+
+class ResultStore:
+    """
+    SQLite-backed store of the last result for every URL checked.
+
+    Each row keeps the last status (or error), the ETag / Last-Modified validators
+    from the last response, when the URL was first seen, when its current status
+    started and when it was last checked, and the content classifier's verdict
+    on it (with --verify-content). Recording a result also works out whether
+    the URL has just become urgent (HTTP 200 that isn't a soft 404) or just
+    been fixed (HTTP 404, or a soft 404, after having been urgent); those
+    transitions are collected in newly_urgent and newly_fixed as (url, status)
+    tuples.
+    """
+    def __init__(self, path, commit_every=500):
+        self.path = path
+        self.commit_every = commit_every
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(SCHEMA)
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(results)")]
+        if "verdict" not in columns:
+            # Stores made before verdicts were kept.
+            self._connection.execute("ALTER TABLE results ADD COLUMN verdict TEXT")
+        self._connection.commit()
+        self._pending = 0
+        # Validators from responses seen during this run, written by record().
+        self._validators = {}
+        # URLs whose stored result was reused without a request; record() leaves
+        # them untouched so they are rechecked once recheck_after has passed.
+        self._skipped = set()
+        self.newly_urgent = []
+        self.newly_fixed = []
+
+    def get(self, url):
+        """Return the stored row for url as a dict, or None if it has never been checked."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "SELECT url, status, error, etag, last_modified, first_seen, status_since, last_seen "
+                "FROM results WHERE url = ?",
+                (url,)
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        keys = ("url", "status", "error", "etag", "last_modified", "first_seen", "status_since", "last_seen")
+        return dict(zip(keys, row))
+
+    def revalidate(self, url, recheck_after=0):
+        """
+        Prepare a --changed-only check of url.
+
+        Returns (cached_result, headers). cached_result is a check_info_php style
+        tuple when the URL was checked less than recheck_after seconds ago and can
+        be skipped; otherwise it is None and headers holds the conditional request
+        headers (If-None-Match / If-Modified-Since) to send.
+        """
+        row = self.get(url)
+        if row is None:
+            return None, {}
+        if row["error"] is None and recheck_after and time.time() - row["last_seen"] < recheck_after:
+            with self._lock:
+                self._skipped.add(url)
+            if row["status"] == NOT_FOUND:
+                return (None, None, None), {}
+            return (url, row["status"], None), {}
+        headers = {}
+        if row["error"] is None:
+            if row["etag"]:
+                headers["If-None-Match"] = row["etag"]
+            if row["last_modified"]:
+                headers["If-Modified-Since"] = row["last_modified"]
+        return None, headers
+
+    def response_status(self, url, response):
+        """
+        Remember the validators from response and return its status code. A 304
+        Not Modified is answered with the status stored for url instead.
+        """
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code == 304:
+            row = self.get(url)
+            if row is not None and row["status"] is not None:
+                return row["status"]
+            return response.status_code
+        if etag or last_modified:
+            with self._lock:
+                self._validators[url] = (etag, last_modified)
+        return response.status_code
+
+    def record(self, url, status, error, verdict=None):
+        """Store the latest result for url (and its verdict) and note any urgent/fixed transition."""
+        now = time.time()
+        with self._lock:
+            if url in self._skipped:
+                self._skipped.discard(url)
+                return
+            validators = self._validators.pop(url, (None, None))
+            row = self._connection.execute(
+                "SELECT status, error, etag, last_modified, first_seen, status_since, verdict "
+                "FROM results WHERE url = ?",
+                (url,)
+            ).fetchone()
+            if row is None:
+                previous_status = previous_error = previous_verdict = None
+                etag, last_modified = validators
+                first_seen = status_since = now
+            else:
+                previous_status, previous_error, etag, last_modified, first_seen, status_since, previous_verdict = row
+                if validators != (None, None):
+                    etag, last_modified = validators
+            if error is not None:
+                # Keep the last known status so a transient error isn't a transition.
+                status, verdict = previous_status, previous_verdict
+            if row is not None and (status, error is None) != (previous_status, previous_error is None):
+                status_since = now
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results "
+                "(url, status, error, etag, last_modified, first_seen, status_since, last_seen, verdict) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, status, error, etag, last_modified, first_seen, status_since, now, verdict)
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._connection.commit()
+                self._pending = 0
+            if error is None:
+                was_urgent = is_urgent(previous_status, previous_verdict)
+                if is_urgent(status, verdict) and not was_urgent:
+                    self.newly_urgent.append((url, status))
+                elif (status == NOT_FOUND or verdict == SOFT_404) and was_urgent:
+                    self.newly_fixed.append((url, status))
+
+    def close(self):
+        """Commit any outstanding writes and close the database."""
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
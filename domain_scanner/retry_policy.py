@@ -0,0 +1,233 @@
+import asyncio
+import collections
+import random
+import ssl
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of sending a request to a host whose circuit breaker is open."""
+
+def is_transient(error):
+    """
+    Return True for request errors that are worth retrying: timeouts, refused or
+    reset connections and truncated responses. Certificate errors, DNS failures
+    and invalid URLs will fail the same way again, so they are not retried.
+    """
+    if isinstance(error, requests.RequestException):
+        if isinstance(error, (requests.exceptions.SSLError, requests.exceptions.InvalidURL)):
+            return False
+        if isinstance(error, requests.exceptions.ConnectionError):
+            return "NameResolutionError" not in str(error)
+        return isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError))
+    # The asyncio backend raises a ConnectionError from the underlying error (see async_probe).
+    if isinstance(error, ssl.SSLError) or isinstance(error.__cause__, ssl.SSLError):
+        return False
+    return isinstance(error, ConnectionError) and "Failed to resolve" not in str(error)
+
+class LatencyTracker:
+    """Keep recent response times per host and overall, and report percentiles."""
+    def __init__(self, per_host_samples=50, global_samples=1000):
+        self._per_host = collections.defaultdict(lambda: collections.deque(maxlen=per_host_samples))
+        self._global = collections.deque(maxlen=global_samples)
+        self._global_cache = (0, None)
+        self._lock = threading.Lock()
+
+    def record(self, host, seconds):
+        with self._lock:
+            self._per_host[host].append(seconds)
+            self._global.append(seconds)
+
+    @staticmethod
+    def _percentile(samples, percent):
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def host_percentile(self, host, percent, min_samples=5):
+        """Return the percentile of host's recent latencies, or None with too few samples."""
+        with self._lock:
+            samples = list(self._per_host.get(host, ()))
+        if len(samples) < min_samples:
+            return None
+        return self._percentile(samples, percent)
+
+    def global_percentile(self, percent, min_samples=20):
+        """Return the percentile of recent latencies across all hosts, or None with too few samples."""
+        with self._lock:
+            count = len(self._global)
+            if count < min_samples:
+                return None
+            # Sorting on every request would be wasteful; refresh every 50 samples.
+            cached_count, cached_value = self._global_cache
+            if cached_value is not None and count - cached_count < 50 and count >= cached_count:
+                return cached_value
+            value = self._percentile(self._global, percent)
+            self._global_cache = (count, value)
+            return value
+
+class RetryPolicy:
+    """
+    Timeouts, retries and a per-host circuit breaker for check_info_php.
+
+      - connect_timeout / read_timeout are the longest a request may wait.
+      - Transient errors (see is_transient) are retried up to `retries` times with
+        exponential backoff (backoff, 2 * backoff, ... up to max_backoff, jittered).
+      - With adaptive=True, the first attempt uses a timeout of `adaptive_factor`
+        times the host's p95 latency (or the p99 across all hosts while the host
+        has too few samples), clamped to [min_timeout, configured timeout].
+        Retries always use the full configured timeouts.
+      - With breaker_threshold > 0, a host that has failed that many times in a row
+        is not contacted again for the rest of the run.
+    """
+    def __init__(self, connect_timeout=5, read_timeout=5, retries=0, backoff=0.5, max_backoff=10,
+                 adaptive=False, adaptive_factor=4, min_timeout=1, breaker_threshold=0):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.adaptive = adaptive
+        self.adaptive_factor = adaptive_factor
+        self.min_timeout = min_timeout
+        self.breaker_threshold = breaker_threshold
+        self.latency = LatencyTracker()
+        self._failures = collections.Counter()
+        self._lock = threading.Lock()
+        self.retries_made = 0
+        self.breaker_trips = 0
+        self.breaker_skips = 0
+
+    def timeout_for(self, host, attempt=0):
+        """Return the (connect, read) timeout for an attempt against host."""
+        if not self.adaptive or attempt > 0:
+            return self.connect_timeout, self.read_timeout
+        observed = self.latency.host_percentile(host, 95)
+        if observed is None:
+            observed = self.latency.global_percentile(99)
+        if observed is None:
+            return self.connect_timeout, self.read_timeout
+        limit = max(observed * self.adaptive_factor, self.min_timeout)
+        return min(limit, self.connect_timeout), min(limit, self.read_timeout)
+
+    def backoff_delay(self, attempt):
+        """Return the delay before retry number `attempt` (1-based), with jitter."""
+        delay = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _breaker_open(self, host):
+        with self._lock:
+            return self.breaker_threshold > 0 and self._failures[host] >= self.breaker_threshold
+
+    def _record_outcome(self, host, failed):
+        with self._lock:
+            if not failed:
+                self._failures.pop(host, None)
+                return
+            self._failures[host] += 1
+            if self.breaker_threshold > 0 and self._failures[host] == self.breaker_threshold:
+                self.breaker_trips += 1
+
+    def _check_breaker(self, host):
+        if self._breaker_open(host):
+            with self._lock:
+                self.breaker_skips += 1
+            raise CircuitOpenError(
+                f"Not checked: {host} failed {self.breaker_threshold} times in a row (circuit breaker open)"
+            )
+
+    def _retry_after_failure(self, host, error, attempt):
+        """Record a failed attempt and return True if it should be retried."""
+        self._record_outcome(host, failed=True)
+        if attempt >= self.retries or not is_transient(error):
+            return False
+        self.count_retry()
+        return True
+
+    def count_retry(self):
+        """Count a retry made on this policy's behalf (such as after a Retry-After pause)."""
+        with self._lock:
+            self.retries_made += 1
+
+    def run(self, url, request, limiter=None):
+        """
+        Call request(timeout=...) for url under this policy and return its result.
+
+        With a RateLimiter, each attempt first waits for the rate limits (the wait
+        isn't counted as the host's latency), and a response that paused the
+        domain with Retry-After is requested once more when the pause is over,
+        as one of the policy's retries. request must then return an object with
+        status_code and headers.
+
+        The last error is raised once retries are exhausted, or CircuitOpenError if
+        the host's circuit breaker is open.
+        """
+        parts = urlsplit(url)
+        host = parts.netloc
+        attempt = 0
+        resent = False
+        while True:
+            self._check_breaker(host)
+            if limiter is not None:
+                limiter.acquire(parts.hostname or "")
+            started = time.monotonic()
+            try:
+                response = request(timeout=self.timeout_for(host, attempt))
+            except requests.RequestException as e:
+                if not self._retry_after_failure(host, e, attempt):
+                    raise
+                attempt += 1
+                time.sleep(self.backoff_delay(attempt))
+                continue
+            self.latency.record(host, time.monotonic() - started)
+            self._record_outcome(host, failed=False)
+            if limiter is not None and limiter.note_response(
+                parts.hostname or "", response.status_code, response.headers.get("Retry-After")
+            ) and not resent and attempt < self.retries:
+                self.count_retry()
+                attempt += 1
+                resent = True
+                continue
+            return response
+
+    async def arun(self, url, request):
+        """
+        run() for the asyncio backend, where request(timeout=...) is a coroutine
+        function and its errors are OSErrors.
+        """
+        host = urlsplit(url).netloc
+        attempt = 0
+        while True:
+            self._check_breaker(host)
+            started = time.monotonic()
+            try:
+                response = await request(timeout=self.timeout_for(host, attempt))
+            except OSError as e:
+                if not self._retry_after_failure(host, e, attempt):
+                    raise
+                attempt += 1
+                await asyncio.sleep(self.backoff_delay(attempt))
+                continue
+            self.latency.record(host, time.monotonic() - started)
+            self._record_outcome(host, failed=False)
+            return response
+
+    def summary(self):
+        """Return a one-line, human readable summary of retries and breaker activity."""
+        return (
+            f"{self.retries_made} request(s) retried, {self.breaker_trips} host(s) tripped the circuit breaker, "
+            f"{self.breaker_skips} request(s) skipped by it."
+        )
+
+def build_retry_policy_from_args(args):
+    """Build the RetryPolicy described by the command line options."""
+    return RetryPolicy(
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        retries=args.retries,
+        backoff=args.backoff,
+        adaptive=args.adaptive_timeouts,
+        breaker_threshold=args.breaker_threshold
+    )
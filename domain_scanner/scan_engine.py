@@ -0,0 +1,237 @@
+import collections
+import concurrent.futures
+import time
+from collections import namedtuple
+from functools import partial
+
+# A single completed probe of one path on one domain. "index" is the position of
+# the domain in the input so results can be put back into input order regardless
+# of completion order; results for the same domain are produced in path order.
+# "verdict" is set for HTTP 200 results by the content classifier, if enabled,
+# "elapsed" is how many seconds the check took (None if it wasn't made),
+# "timings" maps the phases of scan_metrics.PHASES to the seconds spent in them
+# and "redirects" lists the URLs redirected to, in order, when redirects are
+# resolved (the status and verdict are then those of the final target).
+ScanResult = namedtuple(
+    "ScanResult",
+    ["index", "domain", "url", "status", "error", "path", "verdict", "elapsed", "timings", "redirects"],
+    defaults=["/info.php", None, None, None, None]
+)
+
+DEFAULT_PATHS = ["/info.php"]
+
+# The buckets results are reported in.
+REPORT_BUCKETS = ("urgent", "soft_404", "redirected", "server_error", "other", "error")
+
+def result_bucket(result):
+    """Return the report bucket of a ScanResult, or "not_found" for the desired HTTP 404."""
+    from .content_classifier import SOFT_404
+
+    if result.url is None:
+        return "not_found"
+    if result.error:
+        return "error"
+    if result.status == 200:
+        return "soft_404" if result.verdict == SOFT_404 else "urgent"
+    if result.status in [301, 302, 307, 308]:
+        return "redirected"
+    if result.status in [500, 503]:
+        return "server_error"
+    return "other"
+
+def target_url(domain, path="/info.php"):
+    """Return the URL that check_info_php requests for a path on a domain."""
+    if not domain.startswith("https://"):
+        domain = "https://" + domain
+    return domain.rstrip("/") + path
+
+def load_paths(filename):
+    """Load the paths to check from a file, one per line, ignoring blank lines and # comments."""
+    paths = []
+    with open(filename, 'r') as file:
+        for line in file:
+            path = line.strip()
+            if path and not path.startswith("#"):
+                paths.append(path if path.startswith("/") else "/" + path)
+    return paths
+
+def paths_from_args(args):
+    """
+    Return the paths selected on the command line: those in --paths-file, or
+    just /info.php. A ScanConfig can also list them directly in `paths`.
+    """
+    if getattr(args, "paths", None):
+        return list(args.paths)
+    return load_paths(args.paths_file) if args.paths_file else DEFAULT_PATHS
+
+def check_paths(domain, paths, check):
+    """
+    Run check(domain, path=path) for each path in turn and return a list of
+    (path, (url, status, error), elapsed_seconds, phase_timings, redirects)
+    tuples. The paths are requested one after the other so they all go over
+    the same kept-alive connection to the host.
+    """
+    from .redirects import recording_redirects
+    from .scan_metrics import timing_phases
+
+    outcomes = []
+    for path in paths:
+        started = time.monotonic()
+        with timing_phases() as timings, recording_redirects() as redirects:
+            outcome = check(domain, path=path)
+        outcomes.append((path, outcome, time.monotonic() - started, timings, redirects or None))
+    return outcomes
+
+def _results_for(index, domain, outcomes):
+    for path, (url, status, error), elapsed, timings, redirects in outcomes:
+        yield ScanResult(
+            index, domain, url, status, error, path, elapsed=elapsed, timings=timings, redirects=redirects
+        )
+
+def iter_scan(items, probe, concurrency=1):
+    """
+    Run probe(domain) for every (index, domain) item and yield a ScanResult for
+    each (domain, path) as the domain completes. probe returns a list of
+    (path, (url, status, error), elapsed_seconds, phase_timings, redirects)
+    tuples, as check_paths does.
+
+    With a concurrency of 1 the probes run one at a time in the calling thread.
+    Otherwise they run through a pool of `concurrency` worker threads and at most
+    2 * concurrency probes are queued at once, so the items are consumed lazily
+    rather than being submitted up front.
+    """
+    if concurrency <= 1:
+        for index, domain in items:
+            yield from _results_for(index, domain, probe(domain))
+        return
+
+    domain_iter = iter(items)
+    max_pending = concurrency * 2
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = {}
+
+        def submit_next():
+            for index, domain in domain_iter:
+                pending[executor.submit(probe, domain)] = (index, domain)
+                return True
+            return False
+
+        while len(pending) < max_pending and submit_next():
+            pass
+
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                index, domain = pending.pop(future)
+                yield from _results_for(index, domain, future.result())
+                submit_next()
+
+def _scan_backend(items, probe, args, dns_cache, paths, limiter=None):
+    if args.backend == "asyncio":
+        from .async_probe import ProbeLimits
+        limits = ProbeLimits(max_in_flight=args.concurrency, per_host=args.per_host_limit, rate_limiter=limiter)
+        # The probe is an AsyncioTransport, whose own settings apply to its requests.
+        return probe.iter_scan(items, paths, limits)
+    return iter_scan(items, partial(check_paths, paths=paths, check=probe), concurrency=args.concurrency)
+
+def scan_items(items, probe, args, dns_cache=None, classifier=None, limiter=None):
+    """
+    Check (index, domain) items with the backend selected on the command line
+    and return an iterator of ScanResults. `probe` is the transport: called for
+    each path by the threads backend, or an AsyncioTransport whose iter_scan()
+    checks every item on one event loop for the asyncio backend.
+    Every path from --paths-file (or just /info.php) is checked on each domain.
+
+    With --pre-resolve, host names are resolved through dns_cache before being
+    probed, and names that don't exist are reported as errors without a request.
+    With a ContentClassifier, every HTTP 200 result is given a verdict. The
+    asyncio backend waits for the RateLimiter, if given, before every request
+    (the threads backend's probe does so itself).
+    """
+    paths = paths_from_args(args)
+    if dns_cache is None or not args.pre_resolve:
+        results = _scan_backend(items, probe, args, dns_cache, paths, limiter)
+    else:
+        results = _scan_pre_resolved(items, probe, args, dns_cache, paths, limiter)
+    if classifier is not None:
+        results = _classify_results(results, classifier, args.concurrency)
+    return results
+
+def scan(domains, probe, args, dns_cache=None, store=None, checkpoint=None, classifier=None, backend=None,
+         limiter=None):
+    """
+    Return an iterator of ScanResults for the domains, checked by scan_items()
+    or, if given, by backend(items) for the (index, domain) items (as the
+    distributed coordinator does).
+
+    If a ResultStore is given, every result (including 404s) is recorded in it.
+    With a Checkpoint, domains it has already completed are skipped (keeping
+    their original index) and every new result is appended to it.
+    """
+    items = enumerate(domains)
+    if checkpoint is not None:
+        items = ((index, domain) for index, domain in items if domain not in checkpoint.done)
+    if backend is None:
+        results = scan_items(items, probe, args, dns_cache=dns_cache, classifier=classifier, limiter=limiter)
+    else:
+        results = backend(items)
+    if store is not None:
+        results = _record_results(results, store)
+    if checkpoint is not None:
+        results = _checkpoint_results(results, checkpoint)
+    return results
+
+def _classify_results(results, classifier, concurrency):
+    # Only HTTP 200s need another request, so they are classified on a pool of
+    # their own while every other result passes straight through.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        pending = set()
+        for result in results:
+            if result.status == 200 and result.error is None:
+                pending.add(executor.submit(classifier.classify_result, result))
+            else:
+                yield result
+            if len(pending) >= max(1, concurrency) * 2:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            else:
+                done = {future for future in pending if future.done()}
+                pending -= done
+            for future in done:
+                yield future.result()
+        for future in concurrent.futures.as_completed(pending):
+            yield future.result()
+
+def _checkpoint_results(results, checkpoint):
+    for result in results:
+        checkpoint.write(result)
+        yield result
+
+def _record_results(results, store):
+    for result in results:
+        if result.url is None:
+            store.record(target_url(result.domain, result.path), 404, None)
+        else:
+            store.record(result.url, result.status, result.error, verdict=result.verdict)
+        yield result
+
+def _scan_pre_resolved(items, probe, args, dns_cache, paths, limiter=None):
+    from .dns_cache import pre_resolve
+
+    # The backend pulls items from probe_items() as it has capacity, so failed
+    # lookups are queued here and yielded alongside the probe results.
+    failed = collections.deque()
+
+    def probe_items():
+        for index, domain, addresses, error in pre_resolve(items, dns_cache, concurrency=args.dns_concurrency):
+            if error:
+                for path in paths:
+                    failed.append(ScanResult(index, domain, target_url(domain, path), None, error, path))
+            else:
+                yield index, domain
+
+    for result in _scan_backend(probe_items(), probe, args, dns_cache, paths, limiter):
+        while failed:
+            yield failed.popleft()
+        yield result
+    while failed:
+        yield failed.popleft()
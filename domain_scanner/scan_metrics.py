@@ -0,0 +1,153 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+
+# Phases of a probe that are timed, in the order they happen. With the threads
+# backend, "dns" is only measured separately when host names are resolved
+# through a DnsCache (--pre-resolve or --dns-server); otherwise the lookup is
+# part of "connect".
+PHASES = ("dns", "connect", "tls", "ttfb")
+
+# Upper bounds (in seconds) of the histogram buckets.
+HISTOGRAM_BOUNDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_timings = contextvars.ContextVar("phase_timings", default=None)
+
+@contextlib.contextmanager
+def timing_phases():
+    """
+    Collect the phase timings of the requests made in this block (on this
+    thread, or in this asyncio task) into the dict it yields, as seconds per
+    phase. Phases that happen more than once, e.g. over redirects or retries,
+    are added up.
+    """
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+def record_phase(phase, seconds):
+    """Add seconds to a phase of the current timing_phases() block, if there is one."""
+    timings = _timings.get()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0) + seconds
+
+class Histogram:
+    """Histogram of durations with Prometheus style bucket bounds (counts are kept per bucket, not cumulative)."""
+    def __init__(self, bounds=HISTOGRAM_BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, fraction):
+        """Return the upper bound of the bucket holding the given quantile (None if it's above the last)."""
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+def _format_bound(seconds):
+    if seconds is None:
+        return f"> {HISTOGRAM_BOUNDS[-1] * 1000:g} ms"
+    return f"<= {seconds * 1000:g} ms"
+
+class ScanMetrics:
+    """
+    Thread-safe aggregate of scan results: a histogram per phase (plus "total",
+    the time each check took), counters per report bucket, and the retry
+    counters of every run. Renders a text summary and Prometheus metrics.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {phase: Histogram() for phase in PHASES + ("total",)}
+        self.buckets = {}
+        self.retries = 0
+        self.breaker_trips = 0
+        self.breaker_skips = 0
+
+    def observe(self, result):
+        """Count a ScanResult and add its timings to the histograms."""
+        from .scan_engine import result_bucket
+
+        bucket = result_bucket(result)
+        with self._lock:
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+            for phase, seconds in (result.timings or {}).items():
+                if phase in self.histograms:
+                    self.histograms[phase].observe(seconds)
+            if result.elapsed is not None:
+                self.histograms["total"].observe(result.elapsed)
+
+    def add_retry_stats(self, policy):
+        """Add the counters of a run's RetryPolicy."""
+        with self._lock:
+            self.retries += policy.retries_made
+            self.breaker_trips += policy.breaker_trips
+            self.breaker_skips += policy.breaker_skips
+
+    def summary(self):
+        """Return a human readable summary of the phase timings, one line per phase."""
+        lines = []
+        with self._lock:
+            for phase, histogram in self.histograms.items():
+                if not histogram.count:
+                    continue
+                lines.append(
+                    f"  {phase}: {histogram.count} sample(s), mean {histogram.sum / histogram.count * 1000:.1f} ms, "
+                    f"p50 {_format_bound(histogram.quantile(0.5))}, p99 {_format_bound(histogram.quantile(0.99))}"
+                )
+        return "\n".join(lines) if lines else "  No timings were recorded."
+
+    def render_prometheus(self, session_stats=()):
+        """
+        Return the metrics in the Prometheus text exposition format. The
+        connection counters are summed over session_stats, the SessionStats of
+        the sessions the scans used.
+        """
+        lines = [
+            "# HELP domain_checker_phase_seconds Time spent in each phase of a check.",
+            "# TYPE domain_checker_phase_seconds histogram",
+        ]
+        with self._lock:
+            for phase, histogram in self.histograms.items():
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f'domain_checker_phase_seconds_bucket{{phase="{phase}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'domain_checker_phase_seconds_bucket{{phase="{phase}",le="+Inf"}} {histogram.count}')
+                lines.append(f'domain_checker_phase_seconds_sum{{phase="{phase}"}} {histogram.sum:.6f}')
+                lines.append(f'domain_checker_phase_seconds_count{{phase="{phase}"}} {histogram.count}')
+            lines.append("# HELP domain_checker_results_total Checked URLs by report bucket.")
+            lines.append("# TYPE domain_checker_results_total counter")
+            for bucket, count in sorted(self.buckets.items()):
+                lines.append(f'domain_checker_results_total{{bucket="{bucket}"}} {count}')
+            counters = [
+                ("retries", "Requests retried after a transient failure.", self.retries),
+                ("breaker_trips", "Hosts that tripped the circuit breaker.", self.breaker_trips),
+                ("breaker_skips", "Requests skipped by an open circuit breaker.", self.breaker_skips),
+            ]
+        session_stats = list(session_stats)
+        counters += [
+            ("requests", "HTTP requests sent.", sum(stats.requests for stats in session_stats)),
+            ("connections_opened", "New connections opened.", sum(stats.connections_opened for stats in session_stats)),
+            ("connections_reused", "Requests sent over a reused keep-alive connection.",
+             sum(stats.connections_reused for stats in session_stats)),
+            ("tls_resumed", "Resumed TLS sessions.", sum(stats.tls_resumed for stats in session_stats)),
+        ]
+        for name, description, value in counters:
+            lines.append(f"# HELP domain_checker_{name}_total {description}")
+            lines.append(f"# TYPE domain_checker_{name}_total counter")
+            lines.append(f"domain_checker_{name}_total {value}")
+        return "\n".join(lines) + "\n"
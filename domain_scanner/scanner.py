@@ -0,0 +1,162 @@
+import asyncio
+import threading
+
+import urllib3
+
+from .config import ScanConfig
+from .content_classifier import build_classifier_from_args
+from .dns_cache import DnsCache, build_dns_cache_from_args
+from .http_session import build_session_from_args
+from .rate_limit import build_rate_limiter_from_args
+from .redirects import build_redirect_resolver_from_args
+from .report import ScanReport
+from .result_store import ResultStore
+from .retry_policy import build_retry_policy_from_args
+from .scan_engine import paths_from_args, scan, scan_items
+from .transport import build_transport_from_args
+
+class Scanner:
+    """
+    Checks domains for exposed paths, as described by a ScanConfig.
+
+    A Scanner owns everything a scan shares between its checks: the pooled
+    session, DNS cache, retry policy, rate limiter, redirect resolver, content
+    classifier and result store, all built from the config. A long-lived caller such as the
+    web UI can pass in a warm session and DNS cache instead, so connections
+    and lookups are reused from one scanner to the next.
+
+    The checks are made by the transport: by default the one for the config's
+    backend (see transport.py), or any callable taking (domain, path=path) and
+    returning (url, status, error). Results are ScanResults, from scan() as an
+    iterator or from ascan() as an async iterator; every result (404s
+    included) is also added to metrics (a ScanMetrics), if given, and report()
+    returns a ScanReport that groups them for printing.
+
+        with Scanner(ScanConfig(concurrency=20, paths=["/info.php", "/.env"])) as scanner:
+            for result in scanner.scan(["example.com", "example.org"]):
+                print(result.url, result.status, result.error)
+    """
+    def __init__(self, config=None, transport=None, session=None, dns_cache=None, metrics=None):
+        self.config = config if config is not None else ScanConfig()
+        self.args = self.config.to_args()
+        if self.config.ignore_ssl:
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        if dns_cache is None:
+            dns_cache = build_dns_cache_from_args(self.args)
+        if dns_cache is None and self.config.per_ip_rate:
+            # Per-IP limits need every host's address before the request is sent.
+            dns_cache = DnsCache()
+        self.dns_cache = dns_cache
+        self._owns_session = session is None
+        self.session = session if session is not None else build_session_from_args(self.args, dns_cache=dns_cache)
+        self.policy = build_retry_policy_from_args(self.args)
+        self.limiter = build_rate_limiter_from_args(self.args, dns_cache=dns_cache)
+        self.classifier = build_classifier_from_args(
+            self.args, session=self.session, policy=self.policy, limiter=self.limiter
+        )
+        self.resolver = build_redirect_resolver_from_args(self.args)
+        self.store = ResultStore(self.config.store) if self.config.store else None
+        if transport is None:
+            transport = build_transport_from_args(
+                self.args, self.session, self.store, self.policy, self.limiter, dns_cache=dns_cache,
+                resolver=self.resolver, classifier=self.classifier
+            )
+        self.transport = transport
+        self.args.backend = getattr(transport, "backend", "threads")
+        self.paths = paths_from_args(self.args)
+        self.metrics = metrics
+
+    def scan(self, domains, checkpoint=None, backend=None):
+        """
+        Return an iterator of ScanResults for the domains, as they complete.
+        With a Checkpoint, domains it has already completed are skipped and
+        every new result is appended to it; backend(items), if given, checks
+        the (index, domain) items instead (as the distributed coordinator does).
+        """
+        results = scan(
+            domains, self.transport, self.args, dns_cache=self.dns_cache, store=self.store, checkpoint=checkpoint,
+            classifier=self.classifier, backend=backend, limiter=self.limiter
+        )
+        return self._observed(results)
+
+    def scan_items(self, items):
+        """Check (index, domain) items (as a distributed worker does) and return a list of ScanResults."""
+        return list(self._observed(scan_items(
+            items, self.transport, self.args, dns_cache=self.dns_cache, classifier=self.classifier,
+            limiter=self.limiter
+        )))
+
+    def report(self, previous=(), keep=None):
+        """
+        Return a ScanReport to add this scanner's results to. previous results
+        (such as those of a resumed checkpoint) are added straight away; with
+        keep, only results in those buckets are kept.
+        """
+        return ScanReport(self, previous=previous, keep=keep)
+
+    def _observed(self, results):
+        if self.metrics is None:
+            return results
+        return self._observe(results)
+
+    def _observe(self, results):
+        for result in results:
+            self.metrics.observe(result)
+            yield result
+
+    async def ascan(self, domains, checkpoint=None, backend=None, max_pending=100):
+        """
+        Async iterator of the ScanResults for the domains. The scan runs on a
+        background thread and at most max_pending results wait to be consumed,
+        so a slow consumer holds the scan back rather than buffering results.
+        """
+        loop = asyncio.get_running_loop()
+        pending = asyncio.Queue(maxsize=max_pending)
+        stopped = threading.Event()
+        finished = object()
+
+        def produce():
+            results = self.scan(domains, checkpoint=checkpoint, backend=backend)
+            try:
+                for result in results:
+                    if stopped.is_set():
+                        break
+                    asyncio.run_coroutine_threadsafe(pending.put(result), loop).result()
+            except Exception as e:
+                asyncio.run_coroutine_threadsafe(pending.put(e), loop).result()
+            finally:
+                if hasattr(results, "close"):
+                    results.close()
+                if not stopped.is_set():
+                    asyncio.run_coroutine_threadsafe(pending.put(finished), loop).result()
+
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                item = await pending.get()
+                if item is finished:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stopped.set()
+            # Unblock the producer if it is waiting for room in the queue.
+            while not pending.empty():
+                pending.get_nowait()
+            await producer
+
+    def close(self):
+        """Close the result store (and the session, if the scanner made it), and add its retry counters to metrics."""
+        if self.metrics is not None:
+            self.metrics.add_retry_stats(self.policy)
+        if self.store is not None:
+            self.store.close()
+        if self._owns_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
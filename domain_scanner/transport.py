@@ -0,0 +1,184 @@
+import abc
+from functools import partial
+
+import requests
+
+from .http_session import fetch_status
+from .redirects import record_redirects
+
+def check_info_php(domain, ignore_ssl=False, follow_redirects=False, session=None, probe_mode="get",
+                   store=None, changed_only=False, recheck_after=0, policy=None, path="/info.php",
+                   limiter=None, resolver=None, classifier=None):
+    """
+    Check the /info.php URL (or another sensitive path) for the given domain.
+
+    If a requests.Session is given it is used for the request, so connections
+    can be kept alive and reused across domains. probe_mode is one of "get",
+    "head" or "stream" (see http_session.fetch_status). With a ResultStore and
+    changed_only, a conditional request revalidates the stored result, or the
+    check is skipped if it was made less than recheck_after seconds ago. A
+    RetryPolicy sets the timeouts, retries and circuit breaker for the request,
+    and a RateLimiter spaces requests out and honours Retry-After. With a
+    RedirectResolver, redirects are followed one hop at a time instead and the
+    status (or error) of the final target is returned. With a ContentClassifier,
+    the start of each HTTP 200 body is kept for it (except in "head" mode).
+
+    Returns:
+      - (url, status, None) if the GET request is successful and returns a status code other than 404.
+      - (url, None, error_message) if an exception occurs during the GET request.
+      - (None, None, None) if the response status code is 404 (i.e., desired response).
+    """
+    # Prepend https:// if not already present.
+    if not domain.startswith("https://"):
+        domain = "https://" + domain
+    url = domain.rstrip("/") + path
+    headers = None
+    if store is not None and changed_only:
+        cached, headers = store.revalidate(url, recheck_after=recheck_after)
+        if cached is not None:
+            return cached
+    http = session if session is not None else requests
+
+    def fetch(target):
+        request = partial(
+            fetch_status,
+            http,
+            target,
+            probe_mode,
+            headers=headers if target == url else None,
+            verify=(not ignore_ssl),
+            allow_redirects=follow_redirects and resolver is None,
+            sample_bytes=classifier.sample_bytes if classifier is not None else 0
+        )
+        if policy is not None:
+            response = policy.run(target, request, limiter=limiter)
+        else:
+            if limiter is not None:
+                request = limiter.wrap(target, request)
+            response = request(timeout=5)
+        if response.sample is not None:
+            classifier.keep_sample(target, response.sample)
+        if store is not None:
+            return store.response_status(target, response), response.headers.get("Location")
+        return response.status_code, response.headers.get("Location")
+
+    if resolver is not None:
+        status, error, redirects = resolver.resolve(url, fetch)
+        record_redirects(redirects)
+        if error is not None:
+            return url, None, error
+    else:
+        try:
+            status, location = fetch(url)
+        except requests.RequestException as e:
+            return url, None, str(e)
+    if status != 404:
+        return url, status, None
+    else:
+        return None, None, None
+
+class Transport(abc.ABC):
+    """
+    How a Scanner checks one path on one domain. A transport is called as
+    transport(domain, path=path) and returns (url, status, error) with the
+    same meaning as check_info_php's return value. Any callable with that
+    signature can be used as a transport; its checks run on the scanner's
+    pool of worker threads.
+
+    `backend` names the scan engine backend that drives the transport. A
+    transport for the "asyncio" backend also provides iter_scan(items, paths,
+    limits), which makes the whole scan with its own settings.
+    """
+    backend = "threads"
+
+    @abc.abstractmethod
+    def __call__(self, domain, path="/info.php"):
+        """Check path on domain and return (url, status, error)."""
+
+class RequestsTransport(Transport):
+    """The default transport: check_info_php over a pooled requests.Session."""
+    def __init__(self, session=None, ignore_ssl=False, follow_redirects=False, probe_mode="get", store=None,
+                 changed_only=False, recheck_after=0, policy=None, limiter=None, resolver=None, classifier=None):
+        self.check = partial(
+            check_info_php,
+            ignore_ssl=ignore_ssl,
+            follow_redirects=follow_redirects,
+            session=session,
+            probe_mode=probe_mode,
+            store=store,
+            changed_only=changed_only,
+            recheck_after=recheck_after,
+            policy=policy,
+            limiter=limiter,
+            resolver=resolver,
+            classifier=classifier
+        )
+
+    def __call__(self, domain, path="/info.php"):
+        return self.check(domain, path=path)
+
+class AsyncioTransport(Transport):
+    """
+    Raw HTTP/1.1 over asyncio streams (see async_probe), which can keep
+    thousands of requests in flight on one thread. A Scanner with this
+    transport runs the asyncio backend; calling it directly checks a single
+    path on its own event loop. A RetryPolicy, if given, replaces `timeout`.
+    """
+    backend = "asyncio"
+
+    def __init__(self, ignore_ssl=False, follow_redirects=False, timeout=5, dns_cache=None, resolver=None,
+                 policy=None):
+        self.ignore_ssl = ignore_ssl
+        self.follow_redirects = follow_redirects
+        self.timeout = timeout
+        self.dns_cache = dns_cache
+        self.resolver = resolver
+        self.policy = policy
+
+    def __call__(self, domain, path="/info.php"):
+        import asyncio
+        from .async_probe import async_check_info_php
+
+        return asyncio.run(async_check_info_php(
+            domain, ignore_ssl=self.ignore_ssl, follow_redirects=self.follow_redirects, timeout=self.timeout,
+            dns_cache=self.dns_cache, path=path, resolver=self.resolver, policy=self.policy
+        ))
+
+    def iter_scan(self, items, paths, limits):
+        """
+        Check every path on every (index, domain) item on a single event loop,
+        within the ProbeLimits, and yield a ScanResult for each as it completes
+        (see async_probe.iter_async_scan). This is how a Scanner runs it.
+        """
+        from .async_probe import iter_async_scan
+
+        return iter_async_scan(
+            items, ignore_ssl=self.ignore_ssl, follow_redirects=self.follow_redirects, limits=limits,
+            timeout=self.timeout, dns_cache=self.dns_cache, paths=paths, resolver=self.resolver, policy=self.policy
+        )
+
+def build_transport_from_args(args, session, store, policy, limiter=None, dns_cache=None, resolver=None,
+                              classifier=None):
+    """Return the transport for the --backend selected on the command line."""
+    if args.backend == "asyncio":
+        return AsyncioTransport(
+            ignore_ssl=args.ignore_ssl,
+            follow_redirects=args.follow_redirects,
+            timeout=args.read_timeout,
+            dns_cache=dns_cache,
+            resolver=resolver,
+            policy=policy
+        )
+    return RequestsTransport(
+        session=session,
+        ignore_ssl=args.ignore_ssl,
+        follow_redirects=args.follow_redirects,
+        probe_mode=args.probe_mode,
+        store=store,
+        changed_only=args.changed_only,
+        recheck_after=args.recheck_after,
+        policy=policy,
+        limiter=limiter,
+        resolver=resolver,
+        classifier=classifier
+    )
@@ -0,0 +1,302 @@
+import json
+import random
+import sqlite3
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from .rate_limit import TokenBucket, parse_retry_after
+
+# Teams rejects messages over about 28 KB, so cards are kept well below that.
+DEFAULT_MAX_CARD_BYTES = 20000
+
+# Responses worth sending the same card again for.
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+# Section of the card each kind of alert goes in: (intro TextBlock, extra TextBlock attributes).
+SECTIONS = {
+    "urgent": (
+        "The following domains may have an `info.php` file (or another sensitive path) exposed and require **urgent** attention:",
+        {}
+    ),
+    "redirected": ("**The following domains redirected, so are worth checking:**", {"spacing": "ExtraLarge"}),
+    "fixed": ("**The following domains no longer expose an `info.php` file:**", {"spacing": "ExtraLarge"}),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sent_alerts (
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    sent REAL NOT NULL,
+    PRIMARY KEY (kind, url)
+)
+"""
+
+def _encoded_length(text):
+    # Length of text inside a JSON string, escapes included.
+    return len(json.dumps(text)) - 2
+
+def _section_blocks(kind, lines):
+    intro, attributes = SECTIONS[kind]
+    return [
+        dict({"type": "TextBlock", "text": intro, "wrap": True, "separator": True}, **attributes),
+        {"type": "TextBlock", "text": "\n".join(lines), "wrap": True, "separator": True}
+    ]
+
+def build_payload(sections, urgent, part=None):
+    """
+    Return the Teams message for one card. sections is a list of (kind, lines)
+    in card order; urgent picks the title, and part, if given, is (number, count).
+    """
+    title = "Possible exposed credentials!" if urgent else "Exposed credentials fixed"
+    summary = "Possible exposed credentials" if urgent else "Exposed credentials fixed"
+    if part is not None:
+        title += f" ({part[0]} of {part[1]})"
+        summary += f" ({part[0]} of {part[1]})"
+    adaptive_card = {
+        "$schema": "http://adaptivecards.io/schemas/adaptive-card.json",
+        "type": "AdaptiveCard",
+        "version": "1.6",
+        "body": [
+            {
+                "type": "TextBlock",
+                "size": "ExtraLarge",
+                "weight": "Bolder",
+                "text": title,
+                "style": "heading",
+                "color": "Attention" if urgent else "Good"
+            }
+        ]
+    }
+    for kind, lines in sections:
+        adaptive_card["body"] += _section_blocks(kind, lines)
+    return {
+        "summary": summary,
+        "type": "message",
+        "attachments": [
+            {
+                "contentType": "application/vnd.microsoft.card.adaptive",
+                "content": adaptive_card
+            }
+        ]
+    }
+
+def _alert_lines(kind, alerts):
+    # Yields (group heading or None, line, url) for every alert of a section.
+    # Urgent URLs are grouped by path when several paths were checked.
+    if kind != "urgent":
+        for url, status in alerts:
+            yield None, f"[{url}]({url})\n", url
+        return
+    by_path = {}
+    for url, status in alerts:
+        by_path.setdefault(urlsplit(url).path, []).append(url)
+    for path, urls in by_path.items():
+        for url in urls:
+            yield (f"**{path}**\n" if len(by_path) > 1 else None), f"[{url}]({url})\n", url
+
+def build_cards(urgent_list, redirected_list, fixed_list=None, max_bytes=DEFAULT_MAX_CARD_BYTES):
+    """
+    Split the alerts into as few cards as fit in max_bytes of JSON each and
+    return [(payload, [(kind, url), ...]), ...]: every Teams message with the
+    alerts it carries. Sections run on from one card to the next, and a path
+    heading is repeated at the top of a card that continues its group.
+    """
+    urgent = bool(urgent_list)
+    alerts = [("urgent", urgent_list), ("redirected", redirected_list), ("fixed", fixed_list or [])]
+    base_size = len(json.dumps(build_payload([], urgent, part=(99, 99))))
+    cards = []
+    sections, carried, size = [], [], base_size
+    group = None
+    for kind, kind_alerts in alerts:
+        for heading, line, url in _alert_lines(kind, kind_alerts):
+            new_section = not sections or sections[-1][0] != kind
+            new_group = heading is not None and heading != group
+            lines = ([heading] if new_group else []) + [line]
+            added = sum(_encoded_length(text) + 2 for text in lines)
+            if new_section:
+                added += len(json.dumps(_section_blocks(kind, []))) + 1
+            if carried and size + added > max_bytes:
+                cards.append((sections, carried))
+                sections, carried, size = [], [], base_size
+                lines = ([heading] if heading is not None else []) + [line]
+                added = sum(_encoded_length(text) + 2 for text in lines)
+                added += len(json.dumps(_section_blocks(kind, []))) + 1
+                new_section = True
+            if new_section:
+                sections.append((kind, []))
+            sections[-1][1].extend(lines)
+            carried.append((kind, url))
+            size += added
+            group = heading
+    if carried:
+        cards.append((sections, carried))
+    count = len(cards)
+    return [
+        (build_payload(card_sections, urgent, part=(number, count) if count > 1 else None), card_alerts)
+        for number, (card_sections, card_alerts) in enumerate(cards, start=1)
+    ]
+
+class WebhookNotifier:
+    """
+    Delivers scan alerts to a Teams webhook as one or more size-bounded
+    Adaptive Cards, over a single reused session.
+
+    Each card is retried up to `retries` times on connection errors and on
+    408/429/5xx responses, with exponential backoff (or as long as a
+    Retry-After header asks). Cards are sent at most `rate` per second. With a
+    dedup_window and a state database, alerts for a URL that were delivered
+    less than dedup_window seconds ago (by this or an earlier run) are left out;
+    a URL reported as fixed can alert again straight away, and vice versa.
+    """
+    def __init__(self, webhook_url, session=None, max_bytes=DEFAULT_MAX_CARD_BYTES, retries=3, backoff=1.0,
+                 max_backoff=30, rate=1.0, dedup_window=0, state_path=None, timeout=10):
+        self.webhook_url = webhook_url
+        self.session = session if session is not None else requests.Session()
+        self.max_bytes = max_bytes
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self._bucket = TokenBucket(rate) if rate else None
+        self.dedup_window = dedup_window
+        self._connection = None
+        if dedup_window and state_path:
+            self._connection = sqlite3.connect(state_path)
+            self._connection.execute(SCHEMA)
+            self._connection.commit()
+
+    def _recently_sent(self, kind, urls):
+        if self._connection is None:
+            return set()
+        cutoff = time.time() - self.dedup_window
+        recent = set()
+        for url in urls:
+            row = self._connection.execute(
+                "SELECT sent FROM sent_alerts WHERE kind = ? AND url = ?", (kind, url)
+            ).fetchone()
+            if row is not None and row[0] >= cutoff:
+                recent.add(url)
+        return recent
+
+    def _mark_sent(self, alerts):
+        if self._connection is None:
+            return
+        now = time.time()
+        for kind, url in alerts:
+            # A fixed URL that becomes urgent again (or the reverse) is news.
+            opposite = {"urgent": "fixed", "fixed": "urgent"}.get(kind)
+            if opposite is not None:
+                self._connection.execute("DELETE FROM sent_alerts WHERE kind = ? AND url = ?", (opposite, url))
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sent_alerts (kind, url, sent) VALUES (?, ?, ?)", (kind, url, now)
+            )
+        self._connection.commit()
+
+    def _wait_for_rate(self):
+        if self._bucket is not None:
+            wait = self._bucket.reserve(time.monotonic())
+            if wait:
+                time.sleep(wait)
+
+    def _post(self, payload):
+        """Post one card, retrying transient failures. Returns (delivered, last response or error)."""
+        attempt = 0
+        while True:
+            self._wait_for_rate()
+            delay = None
+            try:
+                response = self.session.post(self.webhook_url, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                outcome = e
+            else:
+                outcome = response
+                if response.status_code < 300:
+                    return True, response
+                if response.status_code not in RETRY_STATUSES:
+                    return False, response
+                delay = parse_retry_after(response.headers.get("Retry-After"), self.max_backoff)
+            if attempt >= self.retries:
+                return False, outcome
+            attempt += 1
+            if delay is None:
+                delay = min(self.max_backoff, self.backoff * (2 ** (attempt - 1))) * random.uniform(0.5, 1.0)
+            time.sleep(delay)
+
+    def send(self, urgent_list, redirected_list, fixed_list=None, out=None):
+        """
+        Send the alerts, writing what happened to out (standard output by
+        default). Nothing is sent unless there is something urgent or fixed left
+        once recently delivered alerts have been removed. Returns the number of
+        cards delivered.
+        """
+        lists = {"urgent": list(urgent_list), "redirected": list(redirected_list), "fixed": list(fixed_list or [])}
+        suppressed = 0
+        for kind, alerts in lists.items():
+            recent = self._recently_sent(kind, [url for url, status in alerts])
+            if recent:
+                suppressed += len(recent)
+                lists[kind] = [(url, status) for url, status in alerts if url not in recent]
+        if suppressed:
+            print(
+                f"Left {suppressed} alert(s) out of the webhook notification, as they were already "
+                f"sent in the last {self.dedup_window:g} seconds.",
+                file=out
+            )
+        if not lists["urgent"] and not lists["fixed"]:
+            print("No new alerts to send in a webhook notification.", file=out)
+            return 0
+
+        cards = build_cards(lists["urgent"], lists["redirected"], lists["fixed"], max_bytes=self.max_bytes)
+        delivered = 0
+        for number, (payload, alerts) in enumerate(cards, start=1):
+            sent, outcome = self._post(payload)
+            if sent:
+                delivered += 1
+                self._mark_sent(alerts)
+                continue
+            label = f" (card {number} of {len(cards)})" if len(cards) > 1 else ""
+            if isinstance(outcome, requests.RequestException):
+                print(f"Error sending webhook notification{label}:", outcome, file=out)
+            else:
+                print(f"Failed to send webhook notification{label}.", file=out)
+                print("Response:", outcome.text, file=out)
+        if delivered == len(cards):
+            if len(cards) > 1:
+                print(f"Webhook notification sent successfully, as {len(cards)} cards.", file=out)
+            else:
+                print("Webhook notification sent successfully.", file=out)
+        return delivered
+
+    def close(self):
+        """Close the dedup state database."""
+        if self._connection is not None:
+            self._connection.close()
+
+def send_webhook_notification(urgent_list, redirected_list, webhook_url, fixed_list=None, out=None,
+                              notifier=None):
+    """
+    Send a webhook notification to the specified Teams webhook URL using Adaptive Cards.
+    Long lists of domains are split over several size-bounded cards, which are
+    retried with backoff and rate limited by the WebhookNotifier; pass one built
+    from the command line options to also skip alerts sent recently. An
+    optional fixed_list adds a section for domains that no longer expose
+    info.php. Messages are written to out (standard output by default).
+    """
+    if notifier is None:
+        notifier = WebhookNotifier(webhook_url)
+    notifier.send(urgent_list, redirected_list, fixed_list=fixed_list, out=out)
+
+def build_notifier_from_args(args):
+    """Build the WebhookNotifier described by the command line options, or None without --webhook-url."""
+    if not args.webhook_url:
+        return None
+    return WebhookNotifier(
+        args.webhook_url,
+        max_bytes=args.webhook_max_bytes,
+        retries=args.webhook_retries,
+        rate=args.webhook_rate,
+        dedup_window=args.webhook_dedup_window,
+        state_path=args.webhook_state
+    )
@@ -0,0 +1,224 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    finished REAL,
+    checked INTEGER NOT NULL DEFAULT 0,
+    counts TEXT NOT NULL DEFAULT '{}',
+    output TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS job_output (
+    job_id TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_output_job ON job_output (job_id);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, position)
+);
+"""
+
+FINISHED_STATUSES = ("completed", "error")
+
+class JobStore:
+    """
+    Thread-safe registry of web UI scan jobs, kept in an SQLite database so the
+    job history survives a restart.
+
+    Only a small summary of each job (status, times and result counters) is
+    kept in memory. A running job's report and the events streamed by
+    /job_events are appended to the database as they arrive, and are read back
+    from it; when the job finishes, the report is stored with the job and its
+    events are deleted. Finished jobs older than max_age seconds, or beyond the
+    newest max_jobs, are removed. Jobs that were still queued or running when
+    the process stopped are marked as errors on start-up.
+    """
+    def __init__(self, path="jobs.db", max_jobs=100, max_age=7 * 24 * 3600):
+        self.path = path
+        self.max_jobs = max_jobs
+        self.max_age = max_age
+        # Notified whenever a job gets a new event, to wake up /job_events streams.
+        self.updates = threading.Condition()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+        interrupted = self._connection.execute(
+            "SELECT id, output FROM jobs WHERE status NOT IN ('completed', 'error')"
+        ).fetchall()
+        for job_id, output in interrupted:
+            output += self._streamed_output(job_id) + "\nInterrupted: the web UI was restarted before the scan finished."
+            self._connection.execute(
+                "UPDATE jobs SET status = 'error', finished = ?, output = ? WHERE id = ?", (time.time(), output, job_id)
+            )
+            self._delete_streamed(job_id)
+        self._connection.commit()
+        self._jobs = {}
+        for job_id, status, created, finished, checked, counts in self._connection.execute(
+            "SELECT id, status, created, finished, checked, counts FROM jobs ORDER BY created"
+        ):
+            self._jobs[job_id] = {
+                'status': status, 'created': created, 'finished': finished,
+                'checked': checked, 'counts': json.loads(counts)
+            }
+        with self.updates:
+            self._evict()
+
+    def create(self):
+        """Register a new pending job and return its id."""
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self.updates:
+            self._jobs[job_id] = {
+                'status': 'pending', 'created': now, 'finished': None, 'checked': 0, 'counts': {}, 'events': 0
+            }
+            self._connection.execute("INSERT INTO jobs (id, status, created) VALUES (?, 'pending', ?)", (job_id, now))
+            self._connection.commit()
+            self._evict()
+        return job_id
+
+    def discard(self, job_id):
+        """Forget a job that was never started."""
+        with self.updates:
+            self._jobs.pop(job_id, None)
+            self._connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self._delete_streamed(job_id)
+            self._connection.commit()
+
+    def get(self, job_id):
+        """Return a copy of a job's summary and report (without its events), or None if unknown."""
+        with self.updates:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            summary = {key: value for key, value in job.items() if key != 'events'}
+            summary['counts'] = dict(job['counts'])
+            if 'events' in job:
+                summary['output'] = self._streamed_output(job_id)
+                return summary
+            row = self._connection.execute("SELECT output FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        summary['output'] = row[0] if row is not None else ''
+        return summary
+
+    def set_status(self, job_id, status):
+        """Set the status of a job that hasn't finished yet."""
+        with self.updates:
+            self._jobs[job_id]['status'] = status
+            self._connection.execute("UPDATE jobs SET status = ? WHERE id = ?", (status, job_id))
+            self._connection.commit()
+
+    def append_output(self, job_id, text):
+        """Add text to a running job's report."""
+        with self.updates:
+            self._connection.execute("INSERT INTO job_output (job_id, text) VALUES (?, ?)", (job_id, text))
+
+    def set_progress(self, job_id, checked, counts):
+        """
+        Record a running job's result counters. The report and events appended
+        since the last call are committed with them.
+        """
+        with self.updates:
+            job = self._jobs[job_id]
+            job['checked'] = checked
+            job['counts'] = dict(counts)
+            self._connection.commit()
+
+    def add_event(self, job_id, kind, data):
+        """Append an event for /job_events to stream and wake up the streams waiting for it."""
+        with self.updates:
+            job = self._jobs[job_id]
+            self._connection.execute(
+                "INSERT INTO job_events (job_id, position, kind, data) VALUES (?, ?, ?, ?)",
+                (job_id, job['events'], kind, json.dumps(data))
+            )
+            job['events'] += 1
+            self.updates.notify_all()
+
+    def finish(self, job_id, status):
+        """
+        Mark a job as finished, store its report with it and delete its events.
+        A final "done" event carries the report.
+        """
+        now = time.time()
+        with self.updates:
+            job = self._jobs[job_id]
+            output = self._streamed_output(job_id)
+            job.update(status=status, finished=now, done_position=job.pop('events'))
+            self._connection.execute(
+                "UPDATE jobs SET status = ?, finished = ?, checked = ?, counts = ?, output = ? WHERE id = ?",
+                (status, now, job['checked'], json.dumps(job['counts']), output, job_id)
+            )
+            self._delete_streamed(job_id)
+            self._connection.commit()
+            self._evict()
+            self.updates.notify_all()
+
+    def events_since(self, job_id, position, timeout=15, limit=1000):
+        """
+        Return [(position, kind, data), ...] for up to limit of the job's events
+        from position on, waiting up to timeout seconds for one to arrive; an
+        empty list if none did, or None for an unknown job. Once a job has
+        finished only its "done" event is left.
+        """
+        with self.updates:
+            job = self._jobs.get(job_id)
+            if job is not None and 'events' in job and position >= job['events']:
+                self.updates.wait(timeout=timeout)
+                job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if 'events' in job:
+                rows = self._connection.execute(
+                    "SELECT position, kind, data FROM job_events WHERE job_id = ? AND position >= ? "
+                    "ORDER BY position LIMIT ?",
+                    (job_id, position, limit)
+                )
+                return [(index, kind, json.loads(data)) for index, kind, data in rows]
+            done_position = job.get('done_position', 0)
+        summary = self.get(job_id)
+        if summary is None:
+            return None
+        done = {'status': summary['status'], 'output': summary['output']}
+        return [(max(position, done_position), 'done', done)]
+
+    def _streamed_output(self, job_id):
+        # Called with the lock held.
+        rows = self._connection.execute("SELECT text FROM job_output WHERE job_id = ? ORDER BY rowid", (job_id,))
+        return "".join(text for text, in rows)
+
+    def _delete_streamed(self, job_id):
+        # Called with the lock held.
+        self._connection.execute("DELETE FROM job_output WHERE job_id = ?", (job_id,))
+        self._connection.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+
+    def _evict(self):
+        # Called with the lock held.
+        cutoff = time.time() - self.max_age
+        finished = [
+            (job['created'], job_id) for job_id, job in self._jobs.items() if job['status'] in FINISHED_STATUSES
+        ]
+        finished.sort()
+        excess = len(self._jobs) - self.max_jobs
+        expired = []
+        for created, job_id in finished:
+            if created < cutoff or excess > 0:
+                expired.append(job_id)
+                excess -= 1
+        for job_id in expired:
+            del self._jobs[job_id]
+        if expired:
+            self._connection.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in expired])
+            self._connection.commit()
+
+    def close(self):
+        """Close the database."""
+        with self.updates:
+            self._connection.close()
@@ -0,0 +1,341 @@
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import socket
+import socketserver
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_dns import start_stub_dns
+
+# Kinds of mock host and how many of every 100 hosts are of each kind.
+FLEET_MIX = (
+    ("notfound", 65),  # HTTP 404, the usual answer.
+    ("exposed", 10),   # HTTP 200 with a phpinfo() page.
+    ("redirect", 10),  # A chain of redirects ending in a 404.
+    ("slow", 5),       # HTTP 404 after --slow-delay seconds.
+    ("tls", 5),        # Plain HTTP on the HTTPS port, so the TLS handshake fails.
+    ("reset", 5),      # The connection is reset as soon as it is accepted.
+)
+
+DEFAULT_SCALES = (1000, 10000, 100000)
+
+# Metrics compared with the baseline, and whether a higher value is better.
+COMPARED_METRICS = {
+    "hosts_per_sec": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "peak_rss_mb": False,
+    "peak_sockets": False,
+    "tls_resumed": True,
+}
+
+REDIRECT_CHAIN = {"/info.php": (301, "/hop-1"), "/hop-1": (302, "/hop-2"), "/hop-2": (307, "/gone")}
+
+PHPINFO_PAGE = b"<html><head><title>phpinfo()</title></head><body>PHP Version 8.2.0</body></html>"
+
+class MockHostHandler(BaseHTTPRequestHandler):
+    """Answers like the kind of host named by the first label of the Host header."""
+    protocol_version = "HTTP/1.1"
+    timeout = 30
+
+    def do_GET(self, body=True):
+        kind = self.headers.get("Host", "").split("-", 1)[0]
+        if kind == "exposed":
+            self._reply(200, PHPINFO_PAGE, body)
+        elif kind == "redirect" and self.path in REDIRECT_CHAIN:
+            status, location = REDIRECT_CHAIN[self.path]
+            self._reply(status, b"", body, location=location)
+        else:
+            if kind == "slow":
+                time.sleep(self.server.slow_delay)
+            self._reply(404, b"<html><body>Not Found</body></html>", body)
+
+    def do_HEAD(self):
+        self.do_GET(body=False)
+
+    def _reply(self, status, content, body, location=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(content)))
+        if location is not None:
+            self.send_header("Location", location)
+        self.end_headers()
+        if body:
+            self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+class MockHttpServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, slow_delay, ssl_context=None):
+        self.slow_delay = slow_delay
+        self.ssl_context = ssl_context
+        super().__init__(address, MockHostHandler)
+
+    def get_request(self):
+        sock, address = super().get_request()
+        if self.ssl_context is not None:
+            # The handshake happens on the handler's thread, at its first read.
+            sock = self.ssl_context.wrap_socket(sock, server_side=True, do_handshake_on_connect=False)
+        return sock, address
+
+class ResettingServer(socketserver.TCPServer):
+    """Accepts connections and immediately resets them."""
+    request_queue_size = 1024
+
+    def __init__(self, address):
+        super().__init__(address, socketserver.BaseRequestHandler)
+
+    def process_request(self, request, client_address):
+        request.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, b"\x01\x00\x00\x00\x00\x00\x00\x00")
+        request.close()
+
+def generate_certificate(directory):
+    """Create a self-signed certificate for *.bench.test with openssl and return (cert, key) paths."""
+    cert, key = os.path.join(directory, "bench.crt"), os.path.join(directory, "bench.key")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+            "-subj", "/CN=*.bench.test", "-keyout", key, "-out", cert
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    return cert, key
+
+def serve_fleet(connection, slow_delay):
+    """
+    Run the mock fleet (in its own process, so it doesn't skew the scan's
+    measurements) and send its ports back over connection until told to stop.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*generate_certificate(directory))
+    servers = {
+        "https": MockHttpServer(("127.0.0.1", 0), slow_delay, ssl_context=context),
+        "plain": MockHttpServer(("127.0.0.1", 0), slow_delay),
+        "reset": ResettingServer(("127.0.0.1", 0)),
+    }
+    dns = start_stub_dns({"*.bench.test": "127.0.0.1"})
+    for server in servers.values():
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    ports = {name: server.server_address[1] for name, server in servers.items()}
+    ports["dns"] = dns.server_address[1]
+    connection.send(ports)
+    connection.recv()
+
+def fleet_domains(count, ports):
+    """Yield count mock host names, mixed in the proportions of FLEET_MIX."""
+    kinds = [kind for kind, share in FLEET_MIX for _ in range(share)]
+    port_for = {"tls": ports["plain"], "reset": ports["reset"]}
+    for index in range(count):
+        kind = kinds[index % len(kinds)]
+        yield f"{kind}-{index}.bench.test:{port_for.get(kind, ports['https'])}"
+
+class ResourceSampler:
+    """Samples this process's resident memory and open sockets in the background, keeping the peaks."""
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_sockets = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        try:
+            with open("/proc/self/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        self.peak_rss = max(self.peak_rss, int(line.split()[1]) * 1024)
+            sockets = 0
+            for fd in os.listdir("/proc/self/fd"):
+                try:
+                    sockets += os.readlink(f"/proc/self/fd/{fd}").startswith("socket:")
+                except OSError:
+                    pass
+            self.peak_sockets = max(self.peak_sockets, sockets)
+        except OSError:
+            # No /proc (e.g. macOS): fall back to the process's peak so far, in KB on Linux and bytes on macOS.
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.peak_rss = maxrss if sys.platform == "darwin" else maxrss * 1024
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+def percentile(values, fraction):
+    """Return the value below which the given fraction of the sorted values fall."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def run_scale(count, ports, scan_args):
+    """Scan count mock hosts with the scan options in scan_args and return the measurements."""
+    from domain_scanner import ScanConfig, Scanner
+    from domain_scanner.scan_engine import result_bucket
+
+    scanner = Scanner(ScanConfig.from_args(scan_args))
+
+    latencies = []
+    buckets = {}
+    with ResourceSampler() as sampler:
+        started = time.monotonic()
+        for result in scanner.scan(fleet_domains(count, ports)):
+            if result.elapsed is not None:
+                latencies.append(result.elapsed)
+            bucket = result_bucket(result)
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+        duration = time.monotonic() - started
+    # The asyncio backend doesn't use the pooled session, so it doesn't resume TLS sessions.
+    tls_resumed = scanner.session.stats.tls_resumed if scanner.args.backend == "threads" else None
+    scanner.close()
+    latencies.sort()
+    return {
+        "hosts": count,
+        "seconds": round(duration, 2),
+        "hosts_per_sec": round(count / duration, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        "peak_rss_mb": round(sampler.peak_rss / (1024 * 1024), 1),
+        "peak_sockets": sampler.peak_sockets,
+        "tls_resumed": tls_resumed,
+        "buckets": buckets,
+    }
+
+def format_measurement(measurement):
+    """Return a one-line summary of a scale's measurements."""
+    buckets = ", ".join(f"{name} {count}" for name, count in sorted(measurement["buckets"].items()))
+    return (
+        f"{measurement['hosts']} hosts in {measurement['seconds']}s: {measurement['hosts_per_sec']} hosts/sec, "
+        f"p50 {measurement['p50_ms']} ms, p99 {measurement['p99_ms']} ms, "
+        f"peak RSS {measurement['peak_rss_mb']} MB, peak {measurement['peak_sockets']} open socket(s), "
+        f"{measurement.get('tls_resumed')} resumed TLS session(s) ({buckets})"
+    )
+
+def compare(measurement, baseline, tolerance):
+    """Return a description of every metric that is more than tolerance worse than the baseline."""
+    regressions = []
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        old, new = baseline.get(metric), measurement.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{metric} {old} -> {new} ({change:+.0%})")
+    return regressions
+
+def build_parser():
+    """Return the argument parser for the benchmark's own options."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the scan engine against a local fleet of mock HTTPS hosts. Any other "
+                    "options (--concurrency, --backend, --paths-file, ...) are passed on to the scan, "
+                    "as for headless_checker.py."
+    )
+    parser.add_argument(
+        "--scales",
+        type=lambda value: [int(count) for count in value.split(",")],
+        default=list(DEFAULT_SCALES),
+        help="Comma separated numbers of hosts to scan, one run each. Default is 1000,10000,100000."
+    )
+    parser.add_argument(
+        "--slow-delay",
+        type=float,
+        default=0.5,
+        help="Seconds the slow hosts take to answer. Default is 0.5."
+    )
+    parser.add_argument(
+        "--save-baseline",
+        metavar="FILE",
+        help="Save the measurements to this JSON file as the baseline for later runs."
+    )
+    parser.add_argument(
+        "--baseline",
+        metavar="FILE",
+        help="Compare the measurements with a baseline saved by --save-baseline, and exit with "
+             "status 1 if any is worse by more than --tolerance."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Fraction by which a measurement may be worse than the baseline. Default is 0.2."
+    )
+    return parser
+
+def main(argv=None):
+    """Start the mock fleet, scan it at every scale and report (and compare) the measurements."""
+    import urllib3
+    from domain_scanner.options import build_headless_parser as build_scan_parser
+
+    args, scan_argv = build_parser().parse_known_args(argv)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    parent, child = multiprocessing.Pipe()
+    fleet = multiprocessing.Process(target=serve_fleet, args=(child, args.slow_delay), daemon=True)
+    fleet.start()
+    ports = parent.recv()
+    # The mock hosts use a self-signed certificate and only resolve through the stub DNS server.
+    scan_args = build_scan_parser().parse_args(
+        scan_argv + ["--ignore-ssl", "--dns-server", f"127.0.0.1:{ports['dns']}"]
+    )
+
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    measurements = {}
+    regressions = []
+    try:
+        for count in args.scales:
+            measurement = run_scale(count, ports, scan_args)
+            measurements[str(count)] = measurement
+            print(format_measurement(measurement), flush=True)
+            if baseline is not None and str(count) in baseline["scales"]:
+                for regression in compare(measurement, baseline["scales"][str(count)], args.tolerance):
+                    regressions.append(f"{count} hosts: {regression}")
+    finally:
+        parent.send("stop")
+        fleet.join(timeout=5)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump({"options": scan_argv, "scales": measurements}, file, indent=2)
+            file.write("\n")
+        print(f"Saved the measurements as the baseline in {args.save_baseline}.")
+    if baseline is not None:
+        if baseline.get("options", []) != scan_argv:
+            print(f"Note: the baseline was measured with the scan options {baseline.get('options', [])}.")
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+if __name__ == "__main__":
+    main()
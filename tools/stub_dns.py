@@ -0,0 +1,96 @@
+import argparse
+import socketserver
+import struct
+import sys
+import threading
+
+def parse_question(message):
+    """Return (name, qtype, end_offset) for the first question in a DNS query."""
+    labels = []
+    offset = 12
+    while message[offset]:
+        length = message[offset]
+        labels.append(message[offset + 1:offset + 1 + length].decode("ascii").lower())
+        offset += 1 + length
+    qtype = struct.unpack("!H", message[offset + 1:offset + 3])[0]
+    return ".".join(labels), qtype, offset + 5
+
+def lookup(records, name):
+    """Return the IPv4 address for name, honouring "*.example.test" wildcard records."""
+    if name in records:
+        return records[name]
+    labels = name.split(".")
+    for i in range(1, len(labels)):
+        wildcard = "*." + ".".join(labels[i:])
+        if wildcard in records:
+            return records[wildcard]
+    return None
+
+def build_reply(query, records, ttl):
+    """Build the answer to a query: one A record, an empty answer or NXDOMAIN."""
+    query_id = query[:2]
+    name, qtype, end = parse_question(query)
+    address = lookup(records, name)
+    question = query[12:end]
+    if address is None:
+        # Response, recursion desired/available, NXDOMAIN.
+        return query_id + struct.pack("!HHHHH", 0x8183, 1, 0, 0, 0) + question
+    if qtype != 1:
+        return query_id + struct.pack("!HHHHH", 0x8180, 1, 0, 0, 0) + question
+    answer = b"\xc0\x0c" + struct.pack("!HHIH", 1, 1, ttl, 4) + bytes(int(part) for part in address.split("."))
+    return query_id + struct.pack("!HHHHH", 0x8180, 1, 1, 0, 0) + question + answer
+
+class StubDnsServer(socketserver.ThreadingUDPServer):
+    """UDP DNS server that answers A queries from a fixed table of records."""
+    daemon_threads = True
+
+    def __init__(self, address, records, ttl=60):
+        self.records = {name.lower(): ip for name, ip in records.items()}
+        self.ttl = ttl
+        self.queries = 0
+        super().__init__(address, StubDnsHandler)
+
+class StubDnsHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        query, sock = self.request
+        self.server.queries += 1
+        try:
+            reply = build_reply(query, self.server.records, self.server.ttl)
+        except (IndexError, struct.error, UnicodeDecodeError):
+            return
+        sock.sendto(reply, self.client_address)
+
+def start_stub_dns(records, host="127.0.0.1", port=0, ttl=60):
+    """Start a StubDnsServer in a background thread and return it; port 0 picks a free port."""
+    server = StubDnsServer((host, port), records, ttl=ttl)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Local stub DNS server for testing domain_checker.py --dns-server."
+    )
+    parser.add_argument(
+        "records",
+        nargs="+",
+        help="Records as NAME=IPV4, e.g. example.com=127.0.0.1 or '*.bench.test=127.0.0.1'. "
+             "Any other name gets NXDOMAIN."
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on. Default is 127.0.0.1.")
+    parser.add_argument("--port", type=int, default=5353, help="Port to listen on. Default is 5353.")
+    parser.add_argument("--ttl", type=int, default=60, help="TTL of every answer in seconds. Default is 60.")
+    args = parser.parse_args()
+
+    records = {}
+    for record in args.records:
+        name, _, address = record.partition("=")
+        if not address:
+            sys.exit(f"Invalid record '{record}', expected NAME=IPV4.")
+        records[name] = address
+
+    server = StubDnsServer((args.host, args.port), records, ttl=args.ttl)
+    print(f"Stub DNS server listening on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,120 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubWebhookServer(ThreadingHTTPServer):
+    """
+    HTTP server that accepts webhook posts like a Teams incoming webhook, and
+    can be made to misbehave: answer a fraction of posts with HTTP 500, answer
+    HTTP 429 (with Retry-After) beyond a number of posts per second, and reject
+    payloads over a size limit with HTTP 413.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, fail_rate=0.0, max_rate=0, max_bytes=0, retry_after=1, verbose=True):
+        self.fail_rate = fail_rate
+        self.max_rate = max_rate
+        self.max_bytes = max_bytes
+        self.retry_after = retry_after
+        self.verbose = verbose
+        self.received = []
+        self._lock = threading.Lock()
+        self._window = []
+        super().__init__(address, StubWebhookHandler)
+
+    def over_rate(self):
+        """Record a post and return True if there were more than max_rate in the last second."""
+        if not self.max_rate:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            self._window = [seen for seen in self._window if now - seen < 1] + [now]
+            return len(self._window) > self.max_rate
+
+class StubWebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        if server.max_bytes and len(body) > server.max_bytes:
+            return self._reply(413, f"Payload of {len(body)} bytes is over {server.max_bytes}.")
+        if server.over_rate():
+            return self._reply(429, "Too many requests.", retry_after=server.retry_after)
+        if random.random() < server.fail_rate:
+            return self._reply(500, "Simulated failure.")
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return self._reply(400, "Invalid JSON.")
+        with server._lock:
+            server.received.append(payload)
+        if server.verbose:
+            print(f"Received {payload.get('summary', 'a message')!r} ({len(body)} bytes)", flush=True)
+        self._reply(200, "1")
+
+    def _reply(self, status, text, retry_after=None):
+        content = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(content)))
+        if retry_after is not None:
+            self.send_header("Retry-After", str(retry_after))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def start_stub_webhook(host="127.0.0.1", port=0, **kwargs):
+    """Start a StubWebhookServer in a background thread and return it; port 0 picks a free port."""
+    server = StubWebhookServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Local stub webhook server for testing --webhook-url notifications."
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on. Default is 127.0.0.1.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on. Default is 8765.")
+    parser.add_argument(
+        "--fail-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of posts to answer with HTTP 500. Default is 0."
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=int,
+        default=0,
+        help="Answer HTTP 429 to posts beyond this many per second. Default is 0 (no limit)."
+    )
+    parser.add_argument(
+        "--retry-after",
+        type=int,
+        default=1,
+        help="Retry-After seconds sent with HTTP 429. Default is 1."
+    )
+    parser.add_argument(
+        "--max-bytes",
+        type=int,
+        default=28000,
+        help="Reject payloads larger than this with HTTP 413, as Teams does. Default is 28000 (0 for no limit)."
+    )
+    args = parser.parse_args()
+
+    server = StubWebhookServer(
+        (args.host, args.port),
+        fail_rate=args.fail_rate,
+        max_rate=args.max_rate,
+        max_bytes=args.max_bytes,
+        retry_after=args.retry_after
+    )
+    print(f"Stub webhook server listening on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass